@@ -0,0 +1,141 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from engine import Field, colors
+
+# scenarios of the README demos plus dense and dilute gases; every one is a function returning a filled Field
+
+
+def simple_interaction(collision_backend, mode, kernel_backend, seed):
+    fld = Field(880, 720, collision_backend=collision_backend, mode=mode, seed=seed, kernel_backend=kernel_backend)
+    fld.fill(200, "", 10, 5, 0.3)
+    return fld
+
+
+def add_juggernaut(collision_backend, mode, kernel_backend, seed):
+    fld = simple_interaction(collision_backend, mode, kernel_backend, seed)
+    fld.add_sphere(440, 360, 30, 1000, 0, 3, colors['red'])
+    return fld
+
+
+def bim_bom(collision_backend, mode, kernel_backend, seed):
+    fld = Field(880, 720, collision_backend=collision_backend, mode=mode, seed=seed, kernel_backend=kernel_backend)
+    fld.add_sphere(400, 360, 30, 5, 0, 0, colors['purple'])
+    fld.add_sphere(30, 360, 30, 1000, 0, 0.5, colors['red'])
+    return fld
+
+
+def gas(number_of_spheres, area_fraction):
+    # a 16:9 box holding the particles at the given area fraction
+    def scenario(collision_backend, mode, kernel_backend, seed):
+        radius = 5
+        area = number_of_spheres * np.pi * radius ** 2 / area_fraction
+        field_size_x = int(np.sqrt(area * 16 / 9)) + 20
+        field_size_y = int(np.sqrt(area * 9 / 16)) + 20
+        fld = Field(field_size_x, field_size_y, collision_backend=collision_backend, mode=mode, seed=seed,
+                    kernel_backend=kernel_backend)
+        fld.fill(number_of_spheres, "", 10, radius, 0.3)
+        return fld
+    return scenario
+
+
+def scenarios(numbers=(1000, 4000, 16000)):
+    table = {'SimpleInteraction': simple_interaction, 'AddJuggernaut': add_juggernaut, 'BimBom': bim_bom}
+    for number in numbers:
+        table['dilute_' + str(number)] = gas(number, 0.05)
+        table['dense_' + str(number)] = gas(number, 0.35)
+    return table
+
+
+def run_scenario(scenario, ticks=200, collision_backend="grid", mode="fixed", kernel_backend="numpy", seed=0):
+    fld = scenario(collision_backend, mode, kernel_backend, seed)
+    fld.run_ticks(1)  # compiles the Numba kernels outside of the measurement
+    fld.profiler.enabled = True
+    started = time.perf_counter()
+    fld.run_ticks(ticks)
+    seconds = time.perf_counter() - started
+    report = fld.profiler.report()
+
+    # the peak is taken in a separate short run, tracing allocations would distort the timings
+    tracemalloc.start()
+    fld = scenario(collision_backend, mode, kernel_backend, seed)
+    fld.run_ticks(min(ticks, 20))
+    memory_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'number_of_spheres': fld.number_of_spheres, 'kernel_backend': fld.kernel_backend, 'ticks': ticks,
+            'seconds': seconds, 'particle_steps_per_second': fld.number_of_spheres * ticks / seconds,
+            'collisions_per_second': report['counters']['collisions'] / seconds, 'memory_peak': memory_peak,
+            'phases': report['seconds'], 'counters': report['counters']}
+
+
+def run_suite(names=None, numbers=(1000, 4000, 16000), ticks=200, collision_backend="grid", mode="fixed",
+              kernel_backend="numpy", seed=0, progress=None):
+    table = scenarios(numbers)
+    results = {'settings': {'ticks': ticks, 'collision_backend': collision_backend, 'mode': mode,
+                            'kernel_backend': kernel_backend, 'seed': seed},
+               'machine': {'python': platform.python_version(), 'numpy': np.__version__,
+                           'platform': platform.platform(), 'processor': platform.processor()},
+               'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'scenarios': dict()}
+    for name in names or table:
+        results['scenarios'][name] = run_scenario(table[name], ticks, collision_backend, mode, kernel_backend, seed)
+        if progress is not None:
+            progress(name, results['scenarios'][name])
+    return results
+
+
+def compare(results, baseline, tolerance=0.1):
+    # scenarios whose throughput fell by more than tolerance against the baseline run
+    regressions = list()
+    for name, result in results['scenarios'].items():
+        if name not in baseline['scenarios']:
+            continue
+        ratio = result['particle_steps_per_second'] / baseline['scenarios'][name]['particle_steps_per_second']
+        if ratio < 1 - tolerance:
+            regressions.append((name, ratio))
+    return regressions
+
+
+def print_result(name, result):
+    phases = ", ".join("{} {:.3f}s".format(phase, seconds) for phase, seconds in result['phases'].items())
+    print("{}: N={} {:.0f} particle-steps/s, {:.0f} collisions/s, peak {:.1f} MB ({})".format(
+        name, result['number_of_spheres'], result['particle_steps_per_second'], result['collisions_per_second'],
+        result['memory_peak'] / 2 ** 20, phases), file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the canonical Field scenarios headlessly and time them.")
+    parser.add_argument('--scenario', nargs='+', default=None)
+    parser.add_argument('--number', type=int, nargs='+', default=[1000, 4000, 16000])
+    parser.add_argument('--ticks', type=int, default=200)
+    parser.add_argument('--backend', default="grid", choices=["busy_map", "grid"])
+    parser.add_argument('--mode', default="fixed", choices=["fixed", "event"])
+    parser.add_argument('--kernels', default="numpy", choices=["numpy", "numba", "auto"])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default="benchmark.json")
+    parser.add_argument('--compare', default=None, help="earlier results to check for throughput regressions")
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.scenario, args.number, args.ticks, args.backend, args.mode, args.kernels, args.seed,
+                        print_result)
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for name, ratio in regressions:
+            print("{}: throughput at {:.0%} of the baseline".format(name, ratio), file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,222 @@
+import multiprocessing
+import traceback
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from engine import delta_t, particle_columns
+from kernels import load_kernels
+
+# every float column of the particle table is kept in shared memory, one row per column; colours and species codes
+# never change during a run and stay with the Field
+columns = tuple(name for name, (dtype, shape, _) in particle_columns.items() if dtype is float and not shape)
+# the rows the workers read and write, in the order they unpack them; any other column only travels along
+worker_columns = ('x', 'y', 'vx', 'vy', 'mass', 'radius', 'FPT', 'FPL', 'impacts')
+
+
+def strip_arrays(memory, capacity):
+    return np.ndarray((len(columns), capacity), buffer=memory.buf)
+
+
+def worker_rows(arrays):
+    return tuple(arrays[columns.index(name)] for name in worker_columns)
+
+
+def resolve_strip(arrays, kernels, owned, ghosts, left, width, settings, time_s):
+    # contacts of one strip: its own particles plus the ghosts right of its upper edge; a pair belongs to the
+    # strip that owns its lower-numbered local particle, so every pair across an edge is resolved exactly once
+    x, y, vx, vy, mass, radius, FPT, FPL, impacts = arrays
+    local = np.concatenate((owned, ghosts))
+    l_x, l_y, l_vx, l_vy = x[local], y[local], vx[local], vy[local]
+    l_FPT, l_FPL, l_impacts, l_radius = FPT[local], FPL[local], impacts[local], radius[local]
+    pairs_i, pairs_j = kernels.grid_contacts(l_x + l_vx * time_s - left, l_y + l_vy * time_s, l_radius,
+                                             settings['cell_size'], width, settings['field_size_y'])
+    keep = pairs_i < len(owned)
+    collisions = kernels.resolve_pairs(l_x, l_y, l_vx, l_vy, mass[local], l_FPT, l_FPL, l_impacts,
+                                       pairs_i[keep], pairs_j[keep], time_s)
+    vx[local], vy[local], FPT[local], FPL[local], impacts[local] = l_vx, l_vy, l_FPT, l_FPL, l_impacts
+    return collisions
+
+
+def move_strip(arrays, kernels, owned, x_next, y_next, settings, time_s):
+    x, y, vx, vy, mass, radius, FPT, FPL, impacts = arrays
+    wall_width = settings['wall_width']
+    l_x, l_y, l_vx, l_vy, l_FPT, r = x[owned], y[owned], vx[owned], vy[owned], FPT[owned], radius[owned]
+    walls, impulse = kernels.reflect_walls(l_x, l_y, l_vx, l_vy, mass[owned], x_next, y_next, time_s,
+                                           r + wall_width, settings['field_size_x'] - r - wall_width - 1,
+                                           settings['field_size_y'] - r - wall_width - 1)
+    kernels.integrate(l_x, l_y, l_vx, l_vy, l_FPT, time_s)
+    x[owned], y[owned], vx[owned], vy[owned], FPT[owned] = l_x, l_y, l_vx, l_vy, l_FPT
+    return walls, impulse
+
+
+def run_strips(arrays, kernels, barrier, strips, settings, ticks, time_s):
+    # one worker owns an even and the following odd strip; even strips resolve their contacts together,
+    # then odd ones, so no two workers ever write the same particle. Ownership follows the positions at the
+    # start of every tick, which is how particles migrate from strip to strip
+    edges = settings['edges']
+    ghost = settings['ghost']
+    n = settings['number_of_spheres']
+    x, y, vx, vy = (row[:n] for row in arrays[:4])
+    collisions = walls = impulse = 0
+    for _ in range(ticks):
+        barrier.wait()
+        owned = [np.nonzero((x >= edges[s]) & (x < edges[s + 1]))[0] for s in strips]
+        ghosts = [np.nonzero((x >= edges[s + 1]) & (x < edges[s + 1] + ghost))[0] for s in strips]
+        x_next = [x[o] + vx[o] * time_s for o in owned]
+        y_next = [y[o] + vy[o] * time_s for o in owned]
+        for phase, s in enumerate(strips):
+            if phase:
+                barrier.wait()
+            left = edges[s] - ghost
+            collisions += resolve_strip(arrays, kernels, owned[phase], ghosts[phase], left,
+                                        edges[s + 1] - left + ghost, settings, time_s)
+        barrier.wait()
+        for phase in range(len(strips)):
+            hits, transferred = move_strip(arrays, kernels, owned[phase], x_next[phase], y_next[phase], settings,
+                                           time_s)
+            walls += hits
+            impulse += transferred
+    return collisions, walls, impulse
+
+
+def strip_worker(name, capacity, strips, barrier, connection, kernel_backend):
+    memory = shared_memory.SharedMemory(name=name)
+    arrays = worker_rows(strip_arrays(memory, capacity))
+    kernels = load_kernels(kernel_backend)
+    try:
+        while True:
+            command = connection.recv()
+            if command is None:
+                break
+            settings, ticks, time_s = command
+            connection.send(run_strips(arrays, kernels, barrier, strips, settings, ticks, time_s))
+    except Exception:
+        barrier.abort()
+        connection.send(traceback.format_exc())
+    finally:
+        del arrays
+        memory.close()
+
+
+class StripPool:
+    # fixed-step grid simulation of one Field split into vertical strips, two per worker process; the particle
+    # arrays live in shared memory and are copied in and out of the Field once per run_ticks call
+    def __init__(self, field, processes=None):
+        if field.collision_backend != "grid" or field.mode != "fixed":
+            raise ValueError("strip decomposition needs the grid collision backend in fixed mode")
+        self.field = field
+        self.processes = processes or multiprocessing.cpu_count()
+        self.memory = None
+        self.capacity = 0
+        self.workers = list()
+        self.connections = list()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self, capacity):
+        self.close()
+        self.capacity = capacity
+        self.memory = shared_memory.SharedMemory(create=True, size=len(columns) * capacity * 8)
+        barrier = multiprocessing.Barrier(self.processes)
+        for worker in range(self.processes):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=strip_worker, daemon=True,
+                                              args=(self.memory.name, capacity, (2 * worker, 2 * worker + 1),
+                                                    barrier, worker_connection, self.field.kernel_backend))
+            process.start()
+            self.workers.append(process)
+            self.connections.append(connection)
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(None)
+        for process in self.workers:
+            process.join()
+        self.workers = list()
+        self.connections = list()
+        if self.memory is not None:
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
+
+    def edges(self, ghost):
+        # strips hold equal numbers of particles, unless that makes one narrower than the ghost zone
+        fld = self.field
+        strips = 2 * self.processes
+        x = fld.x[:fld.number_of_spheres]
+        edges = np.concatenate(([0], np.quantile(x, np.arange(1, strips) / strips), [fld.field_size_x]))
+        if np.min(np.diff(edges)) < ghost:
+            edges = np.linspace(0, fld.field_size_x, strips + 1)
+        if np.min(np.diff(edges)) < ghost:
+            raise ValueError("field is too narrow for " + str(strips) + " strips with a ghost zone of " +
+                             str(ghost))
+        return edges
+
+    def run_ticks(self, ticks, time_s=delta_t):
+        # step hooks run after every tick and max_travel is checked at the start of every tick, so with either
+        # of them the workers get one tick at a time; otherwise all ticks go out in one batch
+        fld = self.field
+        if not fld.number_of_spheres or not ticks or not time_s:
+            return 0, 0
+        if not fld.step_hooks and fld.max_travel is None:
+            return self.run_batch(ticks, ticks, time_s)
+        collisions = walls = 0
+        for _ in range(ticks):
+            sub_steps = 1
+            if fld.max_travel is not None:
+                # strips have no per-particle sub-steps, the outliers keep to the limit like everybody else
+                speed = np.max(fld.speeds())
+                sub_steps = max(1, int(np.ceil(abs(time_s) * speed / fld.travel_limit())))
+            batch_collisions, batch_walls = self.run_batch(1, sub_steps, time_s / sub_steps)
+            collisions += batch_collisions
+            walls += batch_walls
+        return collisions, walls
+
+    def run_batch(self, ticks, steps, time_s):
+        # steps worker steps of time_s that make up ticks ticks of the field
+        fld = self.field
+        n = fld.number_of_spheres
+        if n > self.capacity:
+            self.start(max(n, 2 * self.capacity))
+        arrays = strip_arrays(self.memory, self.capacity)
+        for row, name in enumerate(columns):
+            arrays[row, :n] = getattr(fld, name)[:n]
+
+        # no collision can make a particle faster than if it carried all the kinetic energy, so particles
+        # further than ghost from an edge cannot reach a partner on the other side during one tick
+        mass = fld.mass[:n]
+        top_speed = np.sqrt(np.sum(mass * (fld.vx[:n] ** 2 + fld.vy[:n] ** 2)) / np.min(mass))
+        ghost = 2 * np.max(fld.radius[:n]) + 2 * top_speed * abs(time_s)
+        settings = {'edges': self.edges(ghost), 'ghost': ghost, 'number_of_spheres': n,
+                    'cell_size': 2 * np.max(fld.radius[:n]), 'wall_width': fld.wall_width,
+                    'field_size_x': fld.field_size_x, 'field_size_y': fld.field_size_y}
+        for connection in self.connections:
+            connection.send((settings, steps, time_s))
+        replies = [connection.recv() for connection in self.connections]
+        errors = [reply for reply in replies if isinstance(reply, str)]
+        if errors:
+            del arrays
+            self.connections = list()
+            self.close()
+            raise RuntimeError("strip worker failed:\n" + errors[0])
+
+        for row, name in enumerate(columns):
+            getattr(fld, name)[:n] = arrays[row, :n]
+        del arrays
+        fld.simulated_time += steps * time_s
+        fld.ticks += ticks
+        fld.statistics.reset()
+        fld.FPL_integrate = fld.statistics.FPL_integrate()
+        fld.FPL_theory = fld.statistics.FPL_theory()
+        collisions, walls, impulse = np.sum(replies, axis=0)
+        fld.wall_impulse += impulse
+        fld.profiler.count('collisions', collisions)
+        fld.profiler.count('wall_hits', walls)
+        for hook in fld.step_hooks:
+            hook(fld)
+        return int(collisions), int(walls)
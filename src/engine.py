@@ -0,0 +1,1108 @@
+import heapq
+import itertools
+import math
+import random
+import time
+from threading import Thread
+
+import numpy as np
+
+from kernels import load_kernels
+from occupancy import OccupancyMap, stencil
+from species import Species, SpeciesTable
+
+colors = {'red': (255, 0, 0),
+          'green': (0, 255, 0),
+          'blue': (0, 0, 255),
+          'white': (255, 255, 255),
+          'grey': (128, 128, 128),
+          'black': (0, 0, 0),
+          'silver': (192, 192, 192),
+          'purple': (128, 0, 128),
+          'yellow': (255, 255, 0),
+          'olive': (128, 128, 0),
+          'grass': (0, 128, 0),
+          'aqua': (0, 255, 255),
+          'navy': (0, 0, 128)}
+color_keys = list(colors.keys())
+color_values = list(colors.values())
+delta_t = 1
+wall_index = -1
+# per-particle columns of a Field as (dtype, shape of one entry, value of unused slots); storage, snapshots,
+# state() and checkpoints all go through this table
+particle_columns = {'x': (float, (), 0), 'y': (float, (), 0), 'vx': (float, (), 0), 'vy': (float, (), 0),
+                    'mass': (float, (), 0), 'radius': (float, (), 0), 'FPT': (float, (), 0), 'FPL': (float, (), 0),
+                    'impacts': (float, (), 0), 'color_map': (np.uint8, (3,), 0),
+                    'species': (np.int16, (), -1)}  # code in species_table, -1 for none
+
+# constants
+k = 1.38065e-23
+R = 8.3145
+mass_correction = 1.67e-27
+speed_correction = 500
+WIDTH = 1280
+HEIGHT = 720
+
+
+def maxwell_distribution(v, mass, T):
+    return mass / T * v ** 2 * np.exp(-mass * v ** 2 / (2 * k * T))
+
+
+def mixture_distribution(v, masses, temperatures, counts):
+    # counts-weighted sum of the per-species distributions, each normalised to unit area
+    v = np.asarray(v, dtype=float)[:, None]
+    masses, temperatures = np.asarray(masses, dtype=float), np.asarray(temperatures, dtype=float)
+    area = masses / temperatures * np.sqrt(np.pi / 2) * (k * temperatures / masses) ** 1.5
+    return np.sum(counts * maxwell_distribution(v, masses, temperatures) / area, axis=1)
+
+
+class Statistics:
+    # running sums over all particles, a particle is removed before and added back after its state changes
+    def __init__(self, field, bins=16):
+        self.field = field
+        self.bins = bins
+        self.reset()
+
+    def reset(self):
+        n = self.field.number_of_spheres
+        mass = self.field.mass[:n]
+        v2 = self.field.vx[:n] ** 2 + self.field.vy[:n] ** 2
+        self.count = n
+        self.sum_mass2 = np.sum(mass ** 2)
+        self.sum_v2 = np.sum(v2)
+        self.sum_mv2 = np.sum(mass * v2)
+        self.sum_radius = np.sum(self.field.radius[:n])
+        self.sum_FPL = np.sum(self.field.FPL[:n])
+        self.histogram_dirty = True
+        self.histogram_range = 0
+        self.bin_index = np.zeros(0, dtype=int)
+        self.counts = np.zeros(self.bins, dtype=int)
+
+    def add(self, i):
+        # i is one index or an array of distinct indices
+        i = np.atleast_1d(i)
+        mass = self.field.mass[i]
+        v2 = self.field.vx[i] ** 2 + self.field.vy[i] ** 2
+        self.count += len(i)
+        self.sum_mass2 += np.sum(mass ** 2)
+        self.sum_v2 += np.sum(v2)
+        self.sum_mv2 += np.sum(mass * v2)
+        self.sum_radius += np.sum(self.field.radius[i])
+        self.sum_FPL += np.sum(self.field.FPL[i])
+        if not self.histogram_dirty:
+            if np.all(i < len(self.bin_index)):
+                self.bin_index[i] = self.find_bin(np.sqrt(v2))
+                np.add.at(self.counts, self.bin_index[i][self.bin_index[i] >= 0], 1)
+            else:
+                self.histogram_dirty = True
+
+    def remove(self, i):
+        i = np.atleast_1d(i)
+        mass = self.field.mass[i]
+        v2 = self.field.vx[i] ** 2 + self.field.vy[i] ** 2
+        self.count -= len(i)
+        self.sum_mass2 -= np.sum(mass ** 2)
+        self.sum_v2 -= np.sum(v2)
+        self.sum_mv2 -= np.sum(mass * v2)
+        self.sum_radius -= np.sum(self.field.radius[i])
+        self.sum_FPL -= np.sum(self.field.FPL[i])
+        if not self.histogram_dirty:
+            i = i[i < len(self.bin_index)]
+            np.subtract.at(self.counts, self.bin_index[i][self.bin_index[i] >= 0], 1)
+
+    def rms_mass(self):
+        return np.sqrt(self.sum_mass2 / self.count) if self.count else 0
+
+    def rms_speed(self):
+        return np.sqrt(self.sum_v2 / self.count) if self.count else 0
+
+    def mean_kinetic(self):
+        return self.sum_mv2 / self.count if self.count else 0
+
+    def temperature(self):
+        return 2 * self.mean_kinetic() / (3 * k)
+
+    def MLS(self):
+        return np.sqrt(2 * k * self.temperature() / self.rms_mass()) if self.count else 0
+
+    def FPL_integrate(self):
+        return self.sum_FPL / self.count if self.count else 0
+
+    def FPL_theory(self):
+        return self.field.working_area / (np.sqrt(2) * 4 * self.sum_radius) if self.count else 0
+
+    def find_bin(self, speed):
+        index = np.floor_divide(speed, self.histogram_range / self.bins).astype(int)
+        index = np.where(speed == self.histogram_range, self.bins - 1, index)
+        return np.where((index < 0) | (index >= self.bins), -1, index)
+
+    def histogram(self):
+        # counts over (0, 2 * MLS) as np.histogram would give them, rebinned only when the range moves
+        histogram_range = 2 * self.MLS()
+        if self.histogram_dirty or abs(histogram_range - self.histogram_range) > 1e-6 * histogram_range:
+            self.histogram_range = histogram_range
+            self.bin_index = self.find_bin(self.field.speeds()) if histogram_range else np.zeros(0, dtype=int)
+            self.counts = np.bincount(self.bin_index[self.bin_index >= 0], minlength=self.bins)
+            self.histogram_dirty = False
+        return self.counts.copy(), np.linspace(0, self.histogram_range, self.bins + 1)
+
+    def species(self):
+        # per-species counts, temperatures, most likely speeds, mean free paths and speed histograms over
+        # (0, 2 * MLS of the species), all in one pass of bincounts over the species codes; particles without
+        # a species are left out
+        field = self.field
+        n = field.number_of_spheres
+        size = len(field.species_table)
+        member = field.species[:n] >= 0
+        codes = field.species[:n][member]
+        mass = field.mass[:n][member]
+        speed = np.hypot(field.vx[:n][member], field.vy[:n][member])
+        count = np.bincount(codes, minlength=size)
+
+        def mean(values):
+            return np.divide(np.bincount(codes, values, minlength=size), count, out=np.zeros(size),
+                             where=count > 0)
+
+        temperature = 2 * mean(mass * speed ** 2) / (3 * k)
+        rms_mass = np.sqrt(mean(mass ** 2))
+        MLS = np.sqrt(np.divide(2 * k * temperature, rms_mass, out=np.zeros(size), where=rms_mass > 0))
+        # mixture mean free path: a particle of s sweeps 2 (r_s + r_t) per unit length through particles of t,
+        # met at a relative speed of sqrt(1 + m_s / m_t) times its own
+        radius, mean_mass = mean(field.radius[:n][member]), mean(mass)
+        ratio = np.divide(mean_mass[:, None], mean_mass, out=np.zeros((size, size)), where=mean_mass > 0)
+        sweep = 2 * (radius[:, None] + radius) * np.sqrt(1 + ratio) @ count
+        FPL_theory = np.divide(field.working_area, sweep, out=np.zeros(size), where=(count > 0) & (sweep > 0))
+
+        histogram_range = 2 * MLS
+        width = np.where(histogram_range > 0, histogram_range / self.bins, np.inf)[codes]
+        index = np.where(speed == histogram_range[codes], self.bins - 1, np.floor(speed / width).astype(int))
+        inside = (index >= 0) & (index < self.bins)
+        histogram = np.bincount(codes[inside] * self.bins + index[inside], minlength=size * self.bins)
+        return {'names': field.species_table.names, 'count': count, 'mass': mean_mass, 'T': temperature, 'MLS': MLS,
+                'FPL_integrate': mean(field.FPL[:n][member]), 'FPL_theory': FPL_theory,
+                'histogram': histogram.reshape(size, self.bins),
+                'bin_edges': histogram_range[:, None] * np.linspace(0, 1, self.bins + 1)}
+
+
+class Profiler:
+    # per-phase wall-clock totals and event counters; while disabled every call returns after one flag check.
+    # With every > 1 only one step in every is timed, the counters always cover all steps
+    def __init__(self, enabled=False, every=1):
+        self.enabled = enabled
+        self.every = every
+        self.reset()
+
+    def reset(self):
+        self.ticks = 0
+        self.sampled_ticks = 0
+        self.sampling = False
+        self.started = dict()
+        self.seconds = dict()
+        self.counters = dict.fromkeys(('collisions', 'wall_hits', 'tunneling', 'add_sphere_retries'), 0)
+
+    def tick(self):
+        self.sampling = self.enabled and self.ticks % self.every == 0
+        if self.enabled:
+            self.ticks += 1
+            self.sampled_ticks += self.sampling
+
+    def start(self, phase):
+        if self.sampling:
+            self.started[phase] = time.perf_counter()
+
+    def stop(self, phase):
+        # reset() may swap the dicts from the render thread at any moment, so the start time is taken in one call
+        started = self.started.pop(phase, None)
+        if self.sampling and started is not None:
+            self.seconds[phase] = self.seconds.get(phase, 0) + time.perf_counter() - started
+
+    def count(self, counter, value=1):
+        if self.enabled:
+            self.counters[counter] = self.counters.get(counter, 0) + int(value)
+
+    def report(self):
+        return {'ticks': self.ticks, 'sampled_ticks': self.sampled_ticks, 'seconds': dict(self.seconds),
+                'counters': dict(self.counters)}
+
+
+class Sphere:
+    # thin view of one particle stored in the Field arrays, index is 1-based as in busy_map
+    def __init__(self, field, index):
+        self.field = field
+        self.index = index
+
+    @property
+    def x(self):
+        return self.field.x[self.index - 1]
+
+    @x.setter
+    def x(self, value):
+        self.field.x[self.index - 1] = value
+
+    @property
+    def y(self):
+        return self.field.y[self.index - 1]
+
+    @y.setter
+    def y(self, value):
+        self.field.y[self.index - 1] = value
+
+    @property
+    def speed(self):
+        return np.hypot(self.field.vx[self.index - 1], self.field.vy[self.index - 1])
+
+    @property
+    def direction(self):  # in degrees
+        return np.degrees(np.arctan2(self.field.vy[self.index - 1], self.field.vx[self.index - 1]))
+
+    def set_velocity(self, direction, speed):
+        self.field.statistics.remove(self.index - 1)
+        self.field.vx[self.index - 1] = speed * np.cos(direction * np.pi / 180)
+        self.field.vy[self.index - 1] = speed * np.sin(direction * np.pi / 180)
+        self.field.statistics.add(self.index - 1)
+        self.field.event_queue = None
+
+    @property
+    def radius(self):
+        return int(self.field.radius[self.index - 1])
+
+    @property
+    def mass(self):
+        return self.field.mass[self.index - 1]
+
+    @property
+    def color(self):
+        return tuple(int(c) for c in self.field.color_map[self.index - 1])
+
+    @property
+    def FPT(self):
+        return self.field.FPT[self.index - 1]
+
+    @property
+    def FPL(self):
+        return self.field.FPL[self.index - 1]
+
+    @property
+    def impacts(self):
+        return int(self.field.impacts[self.index - 1])
+
+
+class Snapshot:
+    # immutable copy of a field state published by the physics thread, readers never see a half-updated tick
+    def __init__(self, field):
+        n = field.number_of_spheres
+        self.number_of_spheres = n
+        for name in particle_columns:
+            array = getattr(field, name)[:n].copy()
+            array.flags.writeable = False
+            setattr(self, name, array)
+        self.time = field.simulated_time
+        self.ticks = field.ticks
+        self.time_rate = field.time_rate
+        self.FPL_integrate = field.FPL_integrate
+        self.FPL_theory = field.FPL_theory
+        self.rms_mass = field.statistics.rms_mass()
+        self.rms_speed = field.statistics.rms_speed()
+        self.T = field.statistics.temperature()
+        self.MLS = field.statistics.MLS()
+        self.histogram, self.bin_edges = field.statistics.histogram()
+        self.profile = field.profiler.report() if field.profiler.enabled else None
+        self.species_statistics = field.statistics.species() if len(field.species_table) else None
+
+    def sphere(self, index):
+        return Sphere(self, index)
+
+
+class Field(Thread):
+    def __init__(self, field_size_x=WIDTH, field_size_y=HEIGHT, color=colors['black'], collision_backend="busy_map",
+                 mode="fixed", seed=None, kernel_backend="numpy"):
+        Thread.__init__(self)
+        if collision_backend not in ("busy_map", "grid"):
+            raise ValueError("unknown collision backend: " + str(collision_backend))
+        if mode not in ("fixed", "event"):
+            raise ValueError("unknown field mode: " + str(mode))
+        self.collision_backend = collision_backend
+        self.mode = mode
+        self.kernels = load_kernels(kernel_backend)
+        self.kernel_backend = self.kernels.name
+        self.random = random.Random(seed)
+        self.event_queue = None
+        self.event_direction = 1
+        self.event_clock = 0
+        self.event_time = np.zeros(0)
+        self.event_counts = np.zeros(0, dtype=int)
+        self.field_size_x = field_size_x
+        self.field_size_y = field_size_y
+        self.wall_width = 10
+        self.working_area = (self.field_size_x - 2 * self.wall_width) * (self.field_size_y - 2 * self.wall_width)
+        self.color = color
+        self.time_rate = 1.0
+        self.is_running = False
+        self.is_stopped = False
+        self.on_sphere_added = None
+        self.step_hooks = list()
+        self.profiler = Profiler()
+        self.snapshot = None
+        self.publish_interval = 1 / 120
+        self.published = 0
+        self.simulated_time = 0
+        self.ticks = 0
+        self.wall_impulse = 0  # momentum handed to the walls since the start, the source of the wall pressure
+        self.max_travel = None  # fraction of the smallest radius a particle may cover per fixed step, None: no limit
+        self.outliers = 0  # fastest particles sub-stepped on their own instead of shortening the step for everybody
+        self.adding_queue = list()
+        self.capacity = 0
+        for name, (dtype, shape, _) in particle_columns.items():
+            setattr(self, name, np.zeros((0,) + shape, dtype=dtype))
+        self.species_table = SpeciesTable()
+        self.FPL_integrate = 0
+        self.FPL_theory = 0
+        self.correction_factor = 1 / 1.06
+        self.number_of_spheres = 0
+        self.tracked_sph_index = 0
+        self.busy_map = None
+        if self.collision_backend == "busy_map":
+            self.busy_map = OccupancyMap(field_size_x, field_size_y, self.wall_width, wall_index)
+        self.reserve(64)
+        self.statistics = Statistics(self)
+
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        capacity = max(capacity, 2 * self.capacity)
+        for name, (dtype, shape, unused) in particle_columns.items():
+            array = np.full((capacity,) + shape, unused, dtype=dtype)
+            array[:self.capacity] = getattr(self, name)
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def sphere(self, index):
+        return Sphere(self, index)
+
+    def stamp(self, indices):
+        self.busy_map.stamp(self.x[indices], self.y[indices], self.radius[indices], indices + 1)
+
+    def restamp(self):
+        # redraw the occupancy map at the current positions, the grid backend keeps no map
+        if self.busy_map is None:
+            return
+        self.profiler.start('stamp')
+        self.busy_map.clear()
+        self.stamp(np.arange(self.number_of_spheres))
+        self.profiler.stop('stamp')
+
+    def add_sphere(self, x, y, radius=10, mass=1, direction=None, speed=None, color=None, species=-1):
+        direction = self.random.randint(0, 360) if direction is None else direction
+        speed = self.random.random() if speed is None else speed
+        color = self.random.choice(color_values) if color is None else color
+        i = self.number_of_spheres
+        self.reserve(i + 1)
+        low = radius + self.wall_width
+        high_x = self.field_size_x - radius - self.wall_width - 1
+        high_y = self.field_size_y - radius - self.wall_width - 1
+        x, y = min(max(x, low), high_x), min(max(y, low), high_y)
+        if self.is_occupied(x, y, radius):
+            self.profiler.count('add_sphere_retries')
+            x, y = self.free_place(radius, low, high_x, high_y)
+
+        self.x[i] = x
+        self.y[i] = y
+        self.vx[i] = speed * np.cos(direction * np.pi / 180)
+        self.vy[i] = speed * np.sin(direction * np.pi / 180)
+        self.mass[i] = mass
+        self.radius[i] = radius
+        self.FPT[i] = self.FPL[i] = self.impacts[i] = 0
+        self.color_map[i] = color
+        self.species[i] = species
+        self.number_of_spheres += 1
+        self.statistics.add(i)
+        self.event_queue = None
+        if self.busy_map is not None:
+            self.stamp(np.array([i]))
+
+    def add_spheres(self, x, y, radius, mass, vx, vy, color=colors['black'], species=-1):
+        # bulk version of add_sphere for positions that are already known to be free
+        number = len(x)
+        i = self.number_of_spheres
+        self.reserve(i + number)
+        self.x[i:i + number] = x
+        self.y[i:i + number] = y
+        self.vx[i:i + number] = vx
+        self.vy[i:i + number] = vy
+        self.mass[i:i + number] = mass
+        self.radius[i:i + number] = radius
+        self.FPT[i:i + number] = self.FPL[i:i + number] = self.impacts[i:i + number] = 0
+        self.color_map[i:i + number] = color
+        self.species[i:i + number] = species
+        self.number_of_spheres += number
+        self.statistics.reset()
+        self.event_queue = None
+        if self.busy_map is not None:
+            self.stamp(np.arange(i, i + number))
+
+    def packing(self, number_of_spheres, radius, order, rng):
+        # candidate centres in one pass: "lattice" fills a hexagonal lattice row by row, "rand" picks random cells
+        # of a square grid and jitters each centre inside its cell, which keeps neighbours apart by construction
+        low = radius + self.wall_width
+        high_x = self.field_size_x - radius - self.wall_width - 1
+        high_y = self.field_size_y - radius - self.wall_width - 1
+        spacing = 2 * radius + 1
+        if order == "lattice":
+            columns = int((high_x - low - spacing / 2) // spacing) + 1
+            rows = int((high_y - low) // (spacing * np.sqrt(3) / 2)) + 1
+            row, column = np.divmod(np.arange(rows * columns), columns)
+            x = low + column * spacing + (row % 2) * spacing / 2
+            y = low + row * spacing * np.sqrt(3) / 2
+        else:
+            cell = max(spacing, np.sqrt((high_x - low) * (high_y - low) / max(number_of_spheres, 1)) * 0.9)
+            columns = int((high_x - low + spacing) // cell)
+            rows = int((high_y - low + spacing) // cell)
+            row, column = np.divmod(rng.permutation(rows * columns), columns)
+            x = low + column * cell + rng.uniform(0, cell - spacing, len(row))
+            y = low + row * cell + rng.uniform(0, cell - spacing, len(row))
+
+        n = self.number_of_spheres
+        if n:
+            # drop candidates covered by particles that are already on the field
+            all_radii = np.concatenate((self.radius[:n] + 1, np.full(len(x), radius + 1.0)))
+            pairs_i, pairs_j = self.kernels.grid_contacts(np.concatenate((self.x[:n], x)),
+                                                          np.concatenate((self.y[:n], y)), all_radii,
+                                                          2 * np.max(all_radii), self.field_size_x,
+                                                          self.field_size_y)
+            free = np.ones(len(x), dtype=bool)
+            free[pairs_j[(pairs_i < n) & (pairs_j >= n)] - n] = False
+            x, y = x[free], y[free]
+        if len(x) < number_of_spheres:
+            raise ValueError("only " + str(len(x)) + " free places for spheres of radius " + str(radius))
+        return x[:number_of_spheres], y[:number_of_spheres]
+
+    def free_place(self, radius, low, high_x, high_y, chunk=256):
+        # random free centre for add_sphere: every centre that a particle on the field rules out is marked on a map
+        # of the allowed centres, so a crowded field is searched once instead of by ever more random draws
+        if high_x < low or high_y < low:
+            raise ValueError("no free place for a sphere of radius " + str(radius))
+        blocked = np.zeros((int(high_y - low) + 1, int(high_x - low) + 1), dtype=bool)
+        n = self.number_of_spheres
+        x = np.rint(self.x[:n] - low).astype(np.int64)
+        y = np.rint(self.y[:n] - low).astype(np.int64)
+        # one pixel of margin, as packing() keeps
+        reach = np.ceil(self.radius[:n]).astype(np.int64) + int(np.ceil(radius)) + 2
+        for r in np.unique(reach).tolist():
+            disc = stencil(r)
+            members = np.nonzero(reach == r)[0]
+            for start in range(0, len(members), chunk):
+                part = members[start:start + chunk]
+                pixel_x = (x[part, None] + disc.d_x).ravel()
+                pixel_y = (y[part, None] + disc.d_y).ravel()
+                inside = ((pixel_x >= 0) & (pixel_x < blocked.shape[1]) &
+                          (pixel_y >= 0) & (pixel_y < blocked.shape[0]))
+                blocked[pixel_y[inside], pixel_x[inside]] = True
+        free_y, free_x = np.nonzero(~blocked)
+        if not len(free_x):
+            raise ValueError("no free place for a sphere of radius " + str(radius))
+        choice = self.random.randrange(len(free_x))
+        return low + int(free_x[choice]), low + int(free_y[choice])
+
+    def velocities(self, number_of_spheres, mass, basic, temperature, rng):
+        if temperature is None:
+            direction = rng.uniform(0, 2 * np.pi, number_of_spheres)
+            speed = basic * rng.random(number_of_spheres)
+            return speed * np.cos(direction), speed * np.sin(direction)
+        # two-dimensional Maxwell-Boltzmann, sigma is chosen so that Statistics.temperature() (2 <m v^2> / 3k)
+        # comes out at the requested temperature
+        sigma = np.sqrt(3 * k * temperature / (4 * np.asarray(mass, dtype=float)))
+        return rng.normal(0, 1, number_of_spheres) * sigma, rng.normal(0, 1, number_of_spheres) * sigma
+
+    def is_occupied(self, x, y, radius):
+        if self.busy_map is not None:
+            return self.busy_map.is_occupied(x, y, radius)
+        n = self.number_of_spheres
+        return np.any((self.x[:n] - x) ** 2 + (self.y[:n] - y) ** 2 < (self.radius[:n] + radius) ** 2)
+
+    def find_sphere(self, x, y):
+        # 1-based index of the particle covering the point, 0 if there is none
+        if self.busy_map is not None:
+            index = self.busy_map[y, x]
+            return index if 0 < index <= self.number_of_spheres else 0
+        n = self.number_of_spheres
+        hit = np.nonzero((self.x[:n] - x) ** 2 + (self.y[:n] - y) ** 2 <= self.radius[:n] ** 2)[0]
+        return hit[0] + 1 if len(hit) else 0
+
+    def fill(self, number_of_spheres, order="rand", mass=1, radius=10, basic=1, temperature=None):
+        if order == "line":
+            for number in range(number_of_spheres):
+                self.add_sphere(number * 20, number * 20, radius, mass, self.random.randint(0, 359),
+                                basic * self.random.random(), colors['black'])
+            return
+        # numpy generator derived from the field RNG, so seeded fills stay reproducible
+        rng = np.random.default_rng(self.random.getrandbits(64))
+        x, y = self.packing(number_of_spheres, radius, order, rng)
+        vx, vy = self.velocities(number_of_spheres, mass, basic, temperature, rng)
+        self.add_spheres(x, y, radius, mass, vx, vy, colors['black'])
+
+    def fill_species(self, table, order="rand", basic=1, temperature=None):
+        # count particles of every species in the table, packed around those already on the field
+        rng = np.random.default_rng(self.random.getrandbits(64))
+        for species in table:
+            code = self.species_table.add(species)
+            x, y = self.packing(species.count, species.radius, order, rng)
+            vx, vy = self.velocities(species.count, species.mass, basic, temperature, rng)
+            self.add_spheres(x, y, species.radius, species.mass, vx, vy, species.color, code)
+
+    def species_indices(self, name):
+        return np.nonzero(self.species[:self.number_of_spheres] == self.species_table.code(name))[0]
+
+    def clear_field(self):
+        self.number_of_spheres = 0
+        self.event_queue = None
+        self.statistics.reset()
+        if self.busy_map is not None:
+            self.busy_map.clear()
+
+    def find_contacts(self, x_next, y_next):
+        n = self.number_of_spheres
+        if self.collision_backend == "grid":
+            return self.kernels.grid_contacts(x_next, y_next, self.radius[:n], 2 * np.max(self.radius[:n]),
+                                              self.field_size_x, self.field_size_y)
+        # every particle looks at the occupancy map under its disc at the next position
+        i, opponent = self.busy_map.overlaps(x_next, y_next, self.radius[:n])
+        opponent = opponent.astype(np.int64) - 1
+        other = opponent != i
+        pairs = np.unique(np.minimum(i, opponent)[other] * n + np.maximum(i, opponent)[other])
+        return pairs // n, pairs % n
+
+    def collide(self, i, j, time_s):
+        # one pair of the event calendar; the kernel gets copies of the two particles only, the whole arrays
+        # would cost O(N) per event
+        pair = np.array([i, j])
+        self.statistics.remove(pair)
+        x, y, vx, vy, mass, FPT, FPL, impacts = (getattr(self, name)[pair] for name in
+                                                 ('x', 'y', 'vx', 'vy', 'mass', 'FPT', 'FPL', 'impacts'))
+        collisions = self.kernels.resolve_pairs(x, y, vx, vy, mass, FPT, FPL, impacts, np.array([0]),
+                                                np.array([1]), time_s)
+        self.vx[pair], self.vy[pair], self.FPT[pair], self.FPL[pair], self.impacts[pair] = vx, vy, FPT, FPL, impacts
+        self.statistics.add(pair)
+        self.profiler.count('collisions', collisions)
+
+    def resolve_contacts(self, pairs_i, pairs_j, x_next, y_next, time_s):
+        # all contacts of a tick: particle pairs in sorted order, then every wall reflection at once;
+        # particles that may change leave the running statistics first and rejoin them afterwards
+        n = self.number_of_spheres
+        if len(pairs_i):
+            touched = np.unique(np.concatenate((pairs_i, pairs_j)))
+            self.statistics.remove(touched)
+            collisions = self.kernels.resolve_pairs(self.x[:n], self.y[:n], self.vx[:n], self.vy[:n], self.mass[:n],
+                                                    self.FPT[:n], self.FPL[:n], self.impacts[:n], pairs_i, pairs_j,
+                                                    time_s)
+            self.statistics.add(touched)
+            self.profiler.count('collisions', collisions)
+        if x_next is not None:
+            r = self.radius[:n]
+            walls, impulse = self.kernels.reflect_walls(self.x[:n], self.y[:n], self.vx[:n], self.vy[:n],
+                                                        self.mass[:n], x_next, y_next, time_s, r + self.wall_width,
+                                                        self.field_size_x - r - self.wall_width - 1,
+                                                        self.field_size_y - r - self.wall_width - 1)
+            self.wall_impulse += impulse
+            self.profiler.count('wall_hits', walls)
+
+    def build_cells(self, cells=None):
+        # cell list of the event calendar, laid out like grid_contacts: with cells wider than the largest
+        # diameter a particle can only touch particles in its own and the eight surrounding cells. Cells hold
+        # about one particle in dilute gases, wider ones would mean more neighbours to check per event,
+        # narrower ones more cell crossings
+        n = self.number_of_spheres
+        self.event_cell_size = max(2 * np.max(self.radius[:n]) + 1, np.sqrt(self.working_area / n))
+        self.event_cells_x = int(self.field_size_x // self.event_cell_size) + 1
+        self.event_cells_y = int(self.field_size_y // self.event_cell_size) + 1
+        if cells is None:
+            cell_x = np.clip((self.x[:n] // self.event_cell_size).astype(int), 0, self.event_cells_x - 1)
+            cell_y = np.clip((self.y[:n] // self.event_cell_size).astype(int), 0, self.event_cells_y - 1)
+            cells = cell_y * self.event_cells_x + cell_x
+        self.event_cells = cells
+        self.event_members = [set() for _ in range(self.event_cells_x * self.event_cells_y)]
+        for i, cell in enumerate(self.event_cells.tolist()):
+            self.event_members[cell].add(i)
+
+    def neighbours(self, i):
+        # particles in the 3 x 3 cells around i, i included
+        cell_y, cell_x = divmod(int(self.event_cells[i]), self.event_cells_x)
+        rows = range(max(cell_y - 1, 0), min(cell_y + 2, self.event_cells_y))
+        columns = range(max(cell_x - 1, 0), min(cell_x + 2, self.event_cells_x))
+        return itertools.chain.from_iterable(self.event_members[row * self.event_cells_x + column]
+                                             for row in rows for column in columns)
+
+    def predict_event(self, i, time_now):
+        # earliest wall contact, cell crossing or contact with a particle of the neighbouring cells of i after
+        # time_now, pushed as (time, i, partner, counts); partners -1 and -2 are walls, -3 and -4 cell crossings.
+        # A neighbourhood holds a handful of particles, plain float arithmetic beats numpy calls on them
+        x, y, vx, vy = self.x.item, self.y.item, self.vx.item, self.vy.item
+        radius, event_time = self.radius.item, self.event_time.item
+        time_i = time_now - event_time(i)
+        vx_i, vy_i, radius_i = vx(i), vy(i), radius(i)
+        x_i = x(i) + vx_i * time_i
+        y_i = y(i) + vy_i * time_i
+        partner = -1
+        event_dt = np.inf
+        for j in self.neighbours(i):
+            if j == i:
+                continue
+            d_t = time_now - event_time(j)
+            vx_j, vy_j = vx(j), vy(j)
+            d_x = x(j) + vx_j * d_t - x_i
+            d_y = y(j) + vy_j * d_t - y_i
+            d_vx = vx_j - vx_i
+            d_vy = vy_j - vy_i
+            b = d_x * d_vx + d_y * d_vy
+            if b >= 0:
+                continue
+            v_v = d_vx ** 2 + d_vy ** 2
+            gap = d_x ** 2 + d_y ** 2 - (radius(j) + radius_i) ** 2
+            discriminant = b ** 2 - v_v * gap
+            if discriminant < 0:
+                continue
+            impact = 0.0 if gap <= 0 else (-b - math.sqrt(discriminant)) / v_v
+            # cells are sets, ties go to the lower index so the outcome does not depend on their order
+            if impact < event_dt or (impact == event_dt and j < partner):
+                partner = j
+                event_dt = impact
+
+        for wall, position, velocity, size in ((-1, x_i, vx_i, self.field_size_x),
+                                               (-2, y_i, vy_i, self.field_size_y)):
+            if velocity > 0:
+                wall_dt = (size - radius_i - self.wall_width - 1 - position) / velocity
+            elif velocity < 0:
+                wall_dt = (radius_i + self.wall_width - position) / velocity
+            else:
+                continue
+            if max(wall_dt, 0) < event_dt:
+                partner = wall
+                event_dt = max(wall_dt, 0)
+        cell_y, cell_x = divmod(int(self.event_cells[i]), self.event_cells_x)
+        for crossing, position, velocity, cell, cells in ((-3, x_i, vx_i, cell_x, self.event_cells_x),
+                                                          (-4, y_i, vy_i, cell_y, self.event_cells_y)):
+            if velocity > 0 and cell < cells - 1:
+                crossing_dt = ((cell + 1) * self.event_cell_size - position) / velocity
+            elif velocity < 0 and cell > 0:
+                crossing_dt = (cell * self.event_cell_size - position) / velocity
+            else:
+                continue
+            if max(crossing_dt, 0) < event_dt:
+                partner = crossing
+                event_dt = max(crossing_dt, 0)
+        if event_dt < np.inf:
+            heapq.heappush(self.event_queue, (time_now + event_dt, i, partner, self.event_counts[i],
+                                              self.event_counts[partner] if partner >= 0 else 0))
+
+    def predict_all(self):
+        # predict_event for every particle at time 0 in one pass, used when the calendar is built
+        n = self.number_of_spheres
+        cells_x, cells_y = self.event_cells_x, self.event_cells_y
+        cell_y, cell_x = np.divmod(self.event_cells, cells_x)
+        order = np.argsort(self.event_cells, kind='stable')
+        counts = np.bincount(self.event_cells, minlength=cells_x * cells_y)
+        starts = np.cumsum(counts) - counts
+        candidates_i = list()
+        candidates_j = list()
+        for d_x, d_y in itertools.product((-1, 0, 1), repeat=2):
+            neighbour_x = cell_x + d_x
+            neighbour_y = cell_y + d_y
+            src = np.nonzero((neighbour_x >= 0) & (neighbour_x < cells_x) &
+                             (neighbour_y >= 0) & (neighbour_y < cells_y))[0]
+            neighbour_key = neighbour_y[src] * cells_x + neighbour_x[src]
+            neighbour_counts = counts[neighbour_key]
+            i = np.repeat(src, neighbour_counts)
+            offsets = np.arange(len(i)) - np.repeat(np.cumsum(neighbour_counts) - neighbour_counts, neighbour_counts)
+            candidates_i.append(i)
+            candidates_j.append(order[np.repeat(starts[neighbour_key], neighbour_counts) + offsets])
+        i = np.concatenate(candidates_i)
+        j = np.concatenate(candidates_j)
+        i, j = i[i != j], j[i != j]
+
+        x, y, vx, vy, radius = self.x[:n], self.y[:n], self.vx[:n], self.vy[:n], self.radius[:n]
+        d_x = x[j] - x[i]
+        d_y = y[j] - y[i]
+        d_vx = vx[j] - vx[i]
+        d_vy = vy[j] - vy[i]
+        b = d_x * d_vx + d_y * d_vy
+        v_v = d_vx ** 2 + d_vy ** 2
+        gap = d_x ** 2 + d_y ** 2 - (radius[j] + radius[i]) ** 2
+        discriminant = b ** 2 - v_v * gap
+        with np.errstate(divide='ignore', invalid='ignore'):
+            impact = np.where(gap <= 0, 0.0, (-b - np.sqrt(discriminant)) / v_v)
+        impact[(b >= 0) | (discriminant < 0)] = np.inf
+        # earliest contact of every particle, ties to the lower partner index as in predict_event
+        order = np.lexsort((j, impact, i))
+        first, index = np.unique(i[order], return_index=True)
+        event_dt = np.full(n, np.inf)
+        partner = np.full(n, -1)
+        event_dt[first] = impact[order[index]]
+        partner[first] = np.where(event_dt[first] < np.inf, j[order[index]], -1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for wall, position, velocity, size in ((-1, x, vx, self.field_size_x), (-2, y, vy, self.field_size_y)):
+                wall_dt = np.where(velocity > 0, (size - radius - self.wall_width - 1 - position) / velocity,
+                                   np.where(velocity < 0, (radius + self.wall_width - position) / velocity, np.inf))
+                earlier = np.maximum(wall_dt, 0) < event_dt
+                partner[earlier] = wall
+                event_dt[earlier] = np.maximum(wall_dt, 0)[earlier]
+            for crossing, position, velocity, cell, cells in ((-3, x, vx, cell_x, cells_x),
+                                                              (-4, y, vy, cell_y, cells_y)):
+                crossing_dt = np.where((velocity > 0) & (cell < cells - 1),
+                                       ((cell + 1) * self.event_cell_size - position) / velocity,
+                                       np.where((velocity < 0) & (cell > 0),
+                                                (cell * self.event_cell_size - position) / velocity, np.inf))
+                earlier = np.maximum(crossing_dt, 0) < event_dt
+                partner[earlier] = crossing
+                event_dt[earlier] = np.maximum(crossing_dt, 0)[earlier]
+        scheduled = np.nonzero(event_dt < np.inf)[0]
+        self.event_queue = [(dt, s, p, 0, 0) for dt, s, p in zip(event_dt[scheduled].tolist(), scheduled.tolist(),
+                                                                 partner[scheduled].tolist())]
+        heapq.heapify(self.event_queue)
+
+    def cross_cell(self, i, crossing):
+        # i moves on into the next cell along x (crossing -3) or y (-4) in the direction of its velocity
+        if crossing == -3:
+            shift = 1 if self.vx[i] > 0 else -1
+        else:
+            shift = self.event_cells_x if self.vy[i] > 0 else -self.event_cells_x
+        cell = int(self.event_cells[i])
+        self.event_members[cell].discard(i)
+        self.event_members[cell + shift].add(i)
+        self.event_cells[i] = cell + shift
+
+    def advance_events(self, time_s):
+        # event-driven hard-sphere dynamics: jump from one predicted contact to the next, stale events are
+        # recognised by the per-particle collision counters and dropped when popped
+        n = self.number_of_spheres
+        direction = 1 if time_s > 0 else -1
+        if direction < 0:
+            # time reversal runs the same calendar logic on mirrored velocities
+            self.vx[:n] *= -1
+            self.vy[:n] *= -1
+        if direction != self.event_direction:
+            self.event_direction = direction
+            self.event_queue = None
+        if self.event_queue is None:
+            self.event_queue = list()
+            self.event_clock = 0
+            self.event_time = np.zeros(n)
+            self.event_counts = np.zeros(n, dtype=int)
+            self.build_cells()
+            self.predict_all()
+
+        time_end = self.event_clock + abs(time_s)
+        while self.event_queue and self.event_queue[0][0] <= time_end:
+            time_now, i, partner, count_i, count_partner = heapq.heappop(self.event_queue)
+            if count_i != self.event_counts[i]:
+                continue
+            if partner >= 0 and count_partner != self.event_counts[partner]:
+                self.predict_event(i, time_now)
+                continue
+            if partner <= -3:
+                # crossing into another cell changes no velocity, so the events others predicted for i stand
+                self.cross_cell(i, partner)
+                self.predict_event(i, time_now)
+                continue
+            involved = [i] if partner < 0 else [i, partner]
+            for s in involved:
+                self.x[s] += self.vx[s] * (time_now - self.event_time[s])
+                self.y[s] += self.vy[s] * (time_now - self.event_time[s])
+                self.FPT[s] += time_now - self.event_time[s]
+                self.event_time[s] = time_now
+                self.event_counts[s] += 1
+            if partner == -1:
+                self.wall_impulse += 2 * self.mass[i] * abs(self.vx[i])
+                self.vx[i] *= -1
+                self.profiler.count('wall_hits')
+            elif partner == -2:
+                self.wall_impulse += 2 * self.mass[i] * abs(self.vy[i])
+                self.vy[i] *= -1
+                self.profiler.count('wall_hits')
+            else:
+                self.collide(i, partner, 1)
+            for s in involved:
+                self.predict_event(s, time_now)
+
+        # synchronise everyone to the end of the step, the predicted calendar stays valid
+        self.x[:n] += self.vx[:n] * (time_end - self.event_time)
+        self.y[:n] += self.vy[:n] * (time_end - self.event_time)
+        self.FPT[:n] += time_end - self.event_time
+        self.event_time[:] = time_end
+        self.event_clock = time_end
+        if direction < 0:
+            self.vx[:n] *= -1
+            self.vy[:n] *= -1
+
+    def step(self, time_s=delta_t):
+        n = self.number_of_spheres
+        if not n or not time_s:
+            return
+        self.simulated_time += time_s
+        self.ticks += 1
+        profiler = self.profiler
+        profiler.tick()
+        if self.mode == "event":
+            profiler.start('events')
+            self.advance_events(time_s)
+            profiler.stop('events')
+            self.restamp()
+        else:
+            # with max_travel set the tick is cut into equal sub-steps short enough for all but the outliers;
+            # every sub-step looks for contacts on a map stamped at the positions it starts from
+            sub_steps = self.sub_steps(time_s)
+            for _ in range(sub_steps):
+                self.advance_fixed(time_s / sub_steps)
+                self.restamp()
+
+        profiler.start('statistics')
+        self.FPL_integrate = self.statistics.FPL_integrate()
+        self.FPL_theory = self.statistics.FPL_theory()
+        profiler.stop('statistics')
+        profiler.start('hooks')
+        for hook in self.step_hooks:
+            hook(self)
+        profiler.stop('hooks')
+
+    def advance_fixed(self, time_s):
+        n = self.number_of_spheres
+        profiler = self.profiler
+        profiler.start('contacts')
+        x_next = self.x[:n] + self.vx[:n] * time_s
+        y_next = self.y[:n] + self.vy[:n] * time_s
+        fast = self.fast_particles(np.arange(n), time_s)
+        # outliers are looked after in advance_outliers, here they only meet the particles they already touch
+        x_next[fast], y_next[fast] = self.x[fast], self.y[fast]
+        pairs_i, pairs_j = self.find_contacts(x_next, y_next)
+        profiler.stop('contacts')
+
+        profiler.start('resolve')
+        self.resolve_contacts(pairs_i, pairs_j, x_next, y_next, time_s)
+        profiler.stop('resolve')
+        if profiler.enabled:
+            # particles moving further than their radius in one step can pass through a partner unnoticed
+            tunneling = self.speeds() * abs(time_s) > self.radius[:n]
+            tunneling[fast] = False
+            profiler.count('tunneling', np.count_nonzero(tunneling))
+
+        if len(fast):
+            self.advance_outliers(fast, time_s)
+            return
+        profiler.start('integrate')
+        self.kernels.integrate(self.x[:n], self.y[:n], self.vx[:n], self.vy[:n], self.FPT[:n], time_s)
+        profiler.stop('integrate')
+
+    def travel_limit(self):
+        return self.max_travel * np.min(self.radius[:self.number_of_spheres])
+
+    def fast_particles(self, indices, time_s):
+        # the given particles that would move further than the travel limit in time_s
+        if self.max_travel is None or not self.outliers:
+            return np.zeros(0, dtype=np.int64)
+        speeds = np.hypot(self.vx[indices], self.vy[indices])
+        return indices[speeds * abs(time_s) > self.travel_limit()]
+
+    def stable_step(self):
+        # longest step in which no particle but the outliers moves further than max_travel of the smallest radius
+        n = self.number_of_spheres
+        if self.max_travel is None or not n:
+            return np.inf
+        speeds = self.speeds()
+        speed = -np.partition(-speeds, min(self.outliers, n - 1))[min(self.outliers, n - 1)]
+        return self.travel_limit() / speed if speed else np.inf
+
+    def sub_steps(self, time_s):
+        return max(1, int(np.ceil(abs(time_s) / self.stable_step())))
+
+    def advance_outliers(self, fast, time_s):
+        # everybody moves on in straight lines while the outliers take steps short enough not to skip a contact,
+        # checked against every particle; particles an outlier speeds up join them for the rest of the step
+        n = self.number_of_spheres
+        profiler = self.profiler
+        limit = self.travel_limit()
+        direction = np.sign(time_s)
+        remaining = abs(time_s)
+        while remaining > 0:
+            profiler.start('contacts')
+            speed = np.max(np.hypot(self.vx[fast], self.vy[fast]))
+            step_s = direction * (min(remaining, limit / speed) if speed else remaining)
+            x_next = self.x[:n] + self.vx[:n] * step_s
+            y_next = self.y[:n] + self.vy[:n] * step_s
+            reach = self.radius[fast, None] + self.radius[:n]
+            near = (x_next[fast, None] - x_next) ** 2 + (y_next[fast, None] - y_next) ** 2 <= reach ** 2
+            near[np.arange(len(fast)), fast] = False
+            rows, partners = np.nonzero(near)
+            pairs = np.unique(np.minimum(fast[rows], partners) * n + np.maximum(fast[rows], partners))
+            pairs_i, pairs_j = pairs // n, pairs % n
+            profiler.stop('contacts')
+
+            profiler.start('resolve')
+            self.resolve_contacts(pairs_i, pairs_j, None, None, step_s)
+            self.reflect_outliers(fast, x_next[fast], y_next[fast], step_s)
+            profiler.stop('resolve')
+
+            profiler.start('integrate')
+            self.kernels.integrate(self.x[:n], self.y[:n], self.vx[:n], self.vy[:n], self.FPT[:n], step_s)
+            profiler.stop('integrate')
+            remaining -= abs(step_s)
+            fast = np.union1d(fast, self.fast_particles(np.union1d(pairs_i, pairs_j), time_s))
+
+    def reflect_outliers(self, fast, x_next, y_next, time_s):
+        r = self.radius[fast]
+        x, y, vx, vy = self.x[fast], self.y[fast], self.vx[fast], self.vy[fast]
+        walls, impulse = self.kernels.reflect_walls(x, y, vx, vy, self.mass[fast], x_next, y_next, time_s,
+                                                    r + self.wall_width, self.field_size_x - r - self.wall_width - 1,
+                                                    self.field_size_y - r - self.wall_width - 1)
+        self.x[fast], self.y[fast], self.vx[fast], self.vy[fast] = x, y, vx, vy
+        self.wall_impulse += impulse
+        self.profiler.count('wall_hits', walls)
+
+    def run_ticks(self, ticks, time_s=delta_t):
+        for _ in range(ticks):
+            self.step(time_s)
+
+    def advance(self, time_s, tick=delta_t):
+        # in event mode the whole interval is one exact step, otherwise it is cut into ticks; tick=None takes
+        # the longest ticks max_travel allows, so slow stretches of a run need only a few
+        if self.mode == "event":
+            self.step(time_s)
+            return
+        if tick is None:
+            if self.max_travel is None:
+                raise ValueError("tick=None takes its ticks from max_travel, which is not set")
+            remaining = abs(time_s)
+            while remaining > 0:
+                tick = min(remaining, self.stable_step())
+                self.step(np.sign(time_s) * tick)
+                remaining -= tick
+            return
+        ticks, rest = divmod(abs(time_s), tick)
+        self.run_ticks(int(ticks), np.sign(time_s) * tick)
+        self.step(np.sign(time_s) * rest)
+
+    def speeds(self):
+        n = self.number_of_spheres
+        return np.hypot(self.vx[:n], self.vy[:n])
+
+    def state(self):
+        n = self.number_of_spheres
+        state = {name: getattr(self, name)[:n].copy() for name in particle_columns}
+        state['time'] = self.simulated_time
+        return state
+
+    def checkpoint(self, path):
+        # everything needed to continue bit-identically: particle arrays, running sums,
+        # the event calendar and the RNG state
+        n = self.number_of_spheres
+        rng_version, rng_state, rng_gauss = self.random.getstate()
+        arrays = {name: getattr(self, name)[:n] for name in particle_columns}
+        statistics = self.statistics
+        arrays.update({
+            'settings': np.array([self.collision_backend, self.mode, self.kernel_backend]),
+            'scalars': np.array([self.field_size_x, self.field_size_y, self.wall_width, self.time_rate,
+                                 self.simulated_time, self.ticks, self.tracked_sph_index, self.event_direction,
+                                 self.event_clock, self.wall_impulse,
+                                 np.nan if self.max_travel is None else self.max_travel, self.outliers]),
+            'color': np.array(self.color),
+            'species_names': np.array(self.species_table.names, dtype=str),
+            'species_table': self.species_table.rows(),
+            'rng_state': np.array(rng_state, dtype=np.uint64),
+            'rng_meta': np.array([rng_version, np.nan if rng_gauss is None else rng_gauss]),
+            'statistics': np.array([statistics.count, statistics.sum_mass2, statistics.sum_v2, statistics.sum_mv2,
+                                    statistics.sum_radius, statistics.sum_FPL]),
+            'histogram': np.array([statistics.histogram_dirty, statistics.histogram_range]),
+            'histogram_bins': statistics.bin_index,
+            'histogram_counts': statistics.counts,
+        })
+        if self.event_queue is not None:
+            arrays['event_queue'] = np.array(self.event_queue, dtype=float).reshape(-1, 5)
+            arrays['event_time'] = self.event_time
+            arrays['event_counts'] = self.event_counts
+            arrays['event_cells'] = self.event_cells
+        with open(path, 'wb') as file:
+            np.savez(file, **arrays)
+
+    @classmethod
+    def restore(cls, path):
+        with np.load(path) as data:
+            collision_backend, mode, kernel_backend = (str(value) for value in data['settings'])
+            (field_size_x, field_size_y, wall_width, time_rate, simulated_time, ticks, tracked_sph_index,
+             event_direction, event_clock, wall_impulse, max_travel, outliers) = data['scalars'].tolist()
+            fld = cls(int(field_size_x), int(field_size_y), tuple(data['color'].tolist()), collision_backend, mode,
+                      kernel_backend=kernel_backend)
+            fld.wall_width = int(wall_width)
+            if fld.busy_map is not None:
+                fld.busy_map = OccupancyMap(fld.field_size_x, fld.field_size_y, fld.wall_width, wall_index)
+            fld.working_area = (fld.field_size_x - 2 * fld.wall_width) * (fld.field_size_y - 2 * fld.wall_width)
+            fld.time_rate = time_rate
+            fld.simulated_time = simulated_time
+            fld.ticks = int(ticks)
+            fld.wall_impulse = wall_impulse
+            fld.max_travel = None if np.isnan(max_travel) else max_travel
+            fld.outliers = int(outliers)
+            fld.tracked_sph_index = int(tracked_sph_index)
+
+            n = len(data['x'])
+            fld.reserve(n)
+            for name in particle_columns:
+                getattr(fld, name)[:n] = data[name]
+            for name, (mass, radius, red, green, blue, count) in zip(data['species_names'].tolist(),
+                                                                     data['species_table'].tolist()):
+                fld.species_table.add(Species(name, mass, radius, (int(red), int(green), int(blue)), int(count)))
+            fld.number_of_spheres = n
+            if fld.busy_map is not None:
+                # the map always holds the discs at the current positions, so it is rebuilt instead of stored
+                fld.stamp(np.arange(n))
+
+            rng_version, rng_gauss = data['rng_meta'].tolist()
+            fld.random.setstate((int(rng_version), tuple(int(value) for value in data['rng_state']),
+                                 None if np.isnan(rng_gauss) else rng_gauss))
+
+            statistics = fld.statistics
+            (count, statistics.sum_mass2, statistics.sum_v2, statistics.sum_mv2, statistics.sum_radius,
+             statistics.sum_FPL) = data['statistics'].tolist()
+            statistics.count = int(count)
+            histogram_dirty, statistics.histogram_range = data['histogram'].tolist()
+            statistics.histogram_dirty = bool(histogram_dirty)
+            statistics.bin_index = data['histogram_bins'].copy()
+            statistics.counts = data['histogram_counts'].copy()
+            fld.FPL_integrate = statistics.FPL_integrate()
+            fld.FPL_theory = statistics.FPL_theory()
+
+            fld.event_direction = int(event_direction)
+            fld.event_clock = event_clock
+            if 'event_queue' in data:
+                fld.event_queue = [(time_now, int(i), int(partner), int(count_i), int(count_partner))
+                                   for time_now, i, partner, count_i, count_partner in data['event_queue'].tolist()]
+                heapq.heapify(fld.event_queue)
+                fld.event_time = data['event_time'].copy()
+                fld.event_counts = data['event_counts'].copy()
+                fld.build_cells(data['event_cells'].copy())
+        return fld
+
+    def stop(self):
+        self.is_stopped = True
+
+    def publish(self):
+        # swapping the reference is atomic, the renderer keeps whichever complete snapshot it already holds
+        self.profiler.start('snapshot')
+        self.snapshot = Snapshot(self)
+        self.profiler.stop('snapshot')
+        self.published = time.perf_counter()
+
+    def run(self):
+        while not self.is_stopped:
+            self.step(delta_t * self.time_rate * self.is_running)
+            if len(self.adding_queue):
+                try:
+                    self.add_sphere(*self.adding_queue[-1], colors['red'])
+                except ValueError:
+                    pass  # the field has no room left for the sphere, the request is dropped
+                else:
+                    self.tracked_sph_index = self.number_of_spheres
+                    if self.on_sphere_added is not None:
+                        self.on_sphere_added(self.number_of_spheres)
+                self.adding_queue.pop()
+            if time.perf_counter() - self.published >= self.publish_interval:
+                self.publish()
+            if not self.is_running:
+                time.sleep(0.001)
@@ -0,0 +1,113 @@
+import argparse
+import csv
+import itertools
+import multiprocessing
+import sys
+import time
+
+import numpy as np
+
+from engine import Field
+
+table_columns = ['number_of_spheres', 'mass', 'radius', 'basic', 'runs', 'FPL_integrate', 'FPL_integrate_std',
+                 'FPL_theory', 'FPL_ratio', 'T', 'MLS', 'seconds']
+
+
+def sweep(numbers, masses, radii, basics, repeats=1, seed=0, ticks=1000, field_size_x=880, field_size_y=720,
+          collision_backend="grid", mode="fixed"):
+    configs = list()
+    for number, mass, radius, basic in itertools.product(numbers, masses, radii, basics):
+        for repeat in range(repeats):
+            configs.append({'number_of_spheres': number, 'mass': mass, 'radius': radius, 'basic': basic,
+                            'seed': seed + len(configs), 'ticks': ticks, 'field_size_x': field_size_x,
+                            'field_size_y': field_size_y, 'collision_backend': collision_backend, 'mode': mode})
+    return configs
+
+
+def run_configuration(config):
+    # one independent simulation, executed inside a pool worker
+    started = time.perf_counter()
+    fld = Field(config['field_size_x'], config['field_size_y'],
+                collision_backend=config['collision_backend'], mode=config['mode'], seed=config['seed'])
+    fld.fill(config['number_of_spheres'], "", config['mass'], config['radius'], config['basic'])
+    fld.run_ticks(config['ticks'])
+
+    # the histogram spans (0, 2 * MLS), so runs at different temperatures share the same bins
+    n_hist, _ = fld.statistics.histogram()
+    result = dict(config)
+    result.update({'FPL_integrate': fld.FPL_integrate, 'FPL_theory': fld.FPL_theory,
+                   'T': fld.statistics.temperature(), 'MLS': fld.statistics.MLS(),
+                   'histogram': n_hist, 'seconds': time.perf_counter() - started})
+    return result
+
+
+def run_ensemble(configs, processes=None, progress=None):
+    results = list()
+    with multiprocessing.Pool(processes) as pool:
+        for result in pool.imap_unordered(run_configuration, configs):
+            results.append(result)
+            if progress is not None:
+                progress(len(results), len(configs), result)
+    results.sort(key=lambda result: result['seed'])
+    return results
+
+
+def aggregate(results):
+    groups = dict()
+    for result in results:
+        key = (result['number_of_spheres'], result['mass'], result['radius'], result['basic'])
+        groups.setdefault(key, list()).append(result)
+    table = list()
+    for (number, mass, radius, basic), group in groups.items():
+        FPLs = np.array([result['FPL_integrate'] for result in group])
+        FPL_theory = np.mean([result['FPL_theory'] for result in group])
+        row = {'number_of_spheres': number, 'mass': mass, 'radius': radius, 'basic': basic, 'runs': len(group),
+               'FPL_integrate': FPLs.mean(), 'FPL_integrate_std': FPLs.std(), 'FPL_theory': FPL_theory,
+               'FPL_ratio': FPLs.mean() / FPL_theory, 'T': np.mean([result['T'] for result in group]),
+               'MLS': np.mean([result['MLS'] for result in group]),
+               'seconds': sum(result['seconds'] for result in group),
+               'histogram': np.sum([result['histogram'] for result in group], axis=0)}
+        table.append(row)
+    return table
+
+
+def write_table(table, path):
+    bins = len(table[0]['histogram']) if table else 0
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(table_columns + ['hist_' + str(i) for i in range(bins)])
+        for row in table:
+            writer.writerow([row[column] for column in table_columns] + list(row['histogram']))
+
+
+def print_progress(done, total, result):
+    print("[{}/{}] N={} m={} r={} basic={} seed={}: <lambda> {}/{} in {:.1f}s".format(
+        done, total, result['number_of_spheres'], result['mass'], result['radius'], result['basic'],
+        result['seed'], round(result['FPL_integrate']), round(result['FPL_theory']), result['seconds']),
+        file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run independent Field configurations on a process pool.")
+    parser.add_argument('--number', type=int, nargs='+', default=[200])
+    parser.add_argument('--mass', type=float, nargs='+', default=[10])
+    parser.add_argument('--radius', type=int, nargs='+', default=[5])
+    parser.add_argument('--basic', type=float, nargs='+', default=[0.3])
+    parser.add_argument('--repeats', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ticks', type=int, default=1000)
+    parser.add_argument('--size', type=int, nargs=2, default=[880, 720])
+    parser.add_argument('--backend', default="grid", choices=["busy_map", "grid"])
+    parser.add_argument('--mode', default="fixed", choices=["fixed", "event"])
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--output', default="ensemble.csv")
+    args = parser.parse_args(argv)
+
+    configs = sweep(args.number, args.mass, args.radius, args.basic, args.repeats, args.seed, args.ticks,
+                    args.size[0], args.size[1], args.backend, args.mode)
+    table = aggregate(run_ensemble(configs, args.processes, print_progress))
+    write_table(table, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+import importlib
+import sys
+
+import numpy as np
+
+# kernels of the fixed-step update; numba_kernels provides the same functions compiled with Numba
+name = "numpy"
+
+
+def grid_contacts(x, y, radius, cell_size, field_size_x, field_size_y):
+    # cell list broad phase: with cells no smaller than the largest diameter every touching pair
+    # lies in the same or in adjacent cells, so only half of the 3x3 neighbourhood has to be scanned
+    cells_x = int(field_size_x // cell_size) + 1
+    cells_y = int(field_size_y // cell_size) + 1
+    cell_x = np.clip((x // cell_size).astype(int), 0, cells_x - 1)
+    cell_y = np.clip((y // cell_size).astype(int), 0, cells_y - 1)
+    key = cell_y * cells_x + cell_x
+    order = np.argsort(key, kind='stable')
+    counts = np.bincount(key, minlength=cells_x * cells_y)
+    starts = np.cumsum(counts) - counts
+
+    candidates_i = list()
+    candidates_j = list()
+    for d_x, d_y in ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1)):
+        neighbour_x = cell_x + d_x
+        neighbour_y = cell_y + d_y
+        src = np.nonzero((neighbour_x >= 0) & (neighbour_x < cells_x) & (neighbour_y < cells_y))[0]
+        neighbour_key = neighbour_y[src] * cells_x + neighbour_x[src]
+        neighbour_counts = counts[neighbour_key]
+        i = np.repeat(src, neighbour_counts)
+        offsets = np.arange(len(i)) - np.repeat(np.cumsum(neighbour_counts) - neighbour_counts, neighbour_counts)
+        j = order[np.repeat(starts[neighbour_key], neighbour_counts) + offsets]
+        if d_x == d_y == 0:
+            i, j = i[i < j], j[i < j]
+        candidates_i.append(i)
+        candidates_j.append(j)
+    i = np.concatenate(candidates_i)
+    j = np.concatenate(candidates_j)
+
+    # exact circle-circle narrow phase
+    hit = (x[i] - x[j]) ** 2 + (y[i] - y[j]) ** 2 < (radius[i] + radius[j]) ** 2
+    i, j = np.minimum(i[hit], j[hit]), np.maximum(i[hit], j[hit])
+    order = np.lexsort((j, i))
+    return i[order], j[order]
+
+
+def colour_pairs(pairs_i, pairs_j, number_of_spheres):
+    # split sorted contact pairs into rounds in which every particle occurs at most once; a pair joins a round
+    # only after all earlier pairs sharing one of its particles, so the rounds reproduce the sequential order
+    rounds = np.zeros(len(pairs_i), dtype=int)
+    remaining = np.arange(len(pairs_i))
+    first = np.empty(number_of_spheres, dtype=int)
+    current = 0
+    while len(remaining):
+        i = pairs_i[remaining]
+        j = pairs_j[remaining]
+        order = np.arange(len(remaining))
+        first[i] = first[j] = len(remaining)
+        np.minimum.at(first, i, order)
+        np.minimum.at(first, j, order)
+        selected = (first[i] == order) & (first[j] == order)
+        rounds[remaining[selected]] = current
+        remaining = remaining[~selected]
+        current += 1
+    return rounds
+
+
+def approaching_pairs(x, y, vx, vy, i, j, time_s):
+    # only pairs closing in (in the current time direction) exchange momentum
+    dx = x[j] - x[i]
+    dy = y[j] - y[i]
+    return (dx * (vx[i] - vx[j]) + dy * (vy[i] - vy[j])) * time_s > 0
+
+
+def collide_pairs(x, y, vx, vy, mass, i, j):
+    # elastic exchange of the velocity components along the line of centres, for pairs without shared particles
+    dx = x[j] - x[i]
+    dy = y[j] - y[i]
+    dist = np.hypot(dx, dy)
+    nx = dx / dist
+    ny = dy / dist
+    v_i = vx[i] * nx + vy[i] * ny
+    v_j = vx[j] * nx + vy[j] * ny
+    m_i = mass[i]
+    m_j = mass[j]
+    d_v_i = ((m_i - m_j) * v_i + 2 * m_j * v_j) / (m_i + m_j) - v_i
+    d_v_j = (2 * m_i * v_i + (m_j - m_i) * v_j) / (m_i + m_j) - v_j
+    vx[i] += d_v_i * nx
+    vy[i] += d_v_i * ny
+    vx[j] += d_v_j * nx
+    vy[j] += d_v_j * ny
+
+
+def resolve_pairs(x, y, vx, vy, mass, FPT, FPL, impacts, pairs_i, pairs_j, time_s):
+    # all contact pairs of a tick, colour round after colour round; returns the number of collisions
+    if not len(pairs_i):
+        return 0
+    collisions = 0
+    rounds = colour_pairs(pairs_i, pairs_j, len(x))
+    order = np.argsort(rounds, kind='stable')
+    bounds = np.searchsorted(rounds[order], np.arange(rounds[order[-1]] + 2))
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        i = pairs_i[order[start:stop]]
+        j = pairs_j[order[start:stop]]
+        hit = approaching_pairs(x, y, vx, vy, i, j, time_s) & ((x[i] != x[j]) | (y[i] != y[j]))
+        i = i[hit]
+        j = j[hit]
+        s = np.concatenate((i, j))
+        impacts[s] += 1
+        FPL[s] = (FPL[s] * (impacts[s] - 1) + FPT[s] * np.hypot(vx[s], vy[s])) / impacts[s]
+        FPT[s] = 0
+        collide_pairs(x, y, vx, vy, mass, i, j)
+        collisions += len(i)
+    return collisions
+
+
+def reflect_walls(x, y, vx, vy, mass, x_next, y_next, time_s, low, high_x, high_y):
+    # returns the number of wall hits and the momentum handed to the walls
+    hit = (x_next >= high_x) & (vx * time_s > 0)
+    impulse = 2 * np.sum(mass[hit] * np.abs(vx[hit]))
+    vx[hit] *= -1
+    x[hit] = high_x[hit]
+    walls = np.count_nonzero(hit)
+    hit = (x_next <= low) & (vx * time_s < 0)
+    impulse += 2 * np.sum(mass[hit] * np.abs(vx[hit]))
+    vx[hit] *= -1
+    x[hit] = low[hit]
+    walls += np.count_nonzero(hit)
+    hit = (y_next >= high_y) & (vy * time_s > 0)
+    impulse += 2 * np.sum(mass[hit] * np.abs(vy[hit]))
+    vy[hit] *= -1
+    y[hit] = high_y[hit]
+    walls += np.count_nonzero(hit)
+    hit = (y_next <= low) & (vy * time_s < 0)
+    impulse += 2 * np.sum(mass[hit] * np.abs(vy[hit]))
+    vy[hit] *= -1
+    y[hit] = low[hit]
+    walls += np.count_nonzero(hit)
+    return walls, impulse
+
+
+def integrate(x, y, vx, vy, FPT, time_s):
+    x += vx * time_s
+    y += vy * time_s
+    FPT += time_s
+
+
+def load_kernels(backend="numpy"):
+    # "numba" needs the optional numba package, "auto" takes it when it is installed
+    if backend == "numpy":
+        return sys.modules[__name__]
+    if backend in ("numba", "auto"):
+        try:
+            return importlib.import_module("numba_kernels")
+        except ImportError:
+            if backend == "numba":
+                raise
+            return sys.modules[__name__]
+    raise ValueError("unknown kernel backend: " + str(backend))
+
+
+def compare_backends(ticks=500, seed=0, collision_backend="grid"):
+    # reference scenario of the window: both backends must end in exactly the same state
+    from engine import Field
+    states = list()
+    for backend in ("numpy", "numba"):
+        fld = Field(880, 720, collision_backend=collision_backend, seed=seed, kernel_backend=backend)
+        fld.fill(200, "", 10, 5, 0.3)
+        fld.run_ticks(ticks)
+        states.append(fld.state())
+    return max(float(np.max(np.abs(states[0][key] - states[1][key]))) for key in ('x', 'y', 'vx', 'vy'))
+
+
+if __name__ == '__main__':
+    for collision_backend in ("busy_map", "grid"):
+        print(collision_backend, "max difference:", compare_backends(collision_backend=collision_backend))
@@ -0,0 +1,120 @@
+import math
+
+import numba
+import numpy as np
+
+# compiled twins of the kernels module: explicit loops in the same arithmetic order, so both backends agree
+# bit for bit; contact pairs are resolved strictly in sorted order, which the numpy colour rounds reproduce
+name = "numba"
+
+
+@numba.njit(cache=True)
+def grid_contacts(x, y, radius, cell_size, field_size_x, field_size_y):
+    n = len(x)
+    cells_x = int(field_size_x // cell_size) + 1
+    cells_y = int(field_size_y // cell_size) + 1
+    cell_x = np.empty(n, dtype=np.int64)
+    cell_y = np.empty(n, dtype=np.int64)
+    counts = np.zeros(cells_x * cells_y, dtype=np.int64)
+    for p in range(n):
+        cell_x[p] = min(max(int(x[p] // cell_size), 0), cells_x - 1)
+        cell_y[p] = min(max(int(y[p] // cell_size), 0), cells_y - 1)
+        counts[cell_y[p] * cells_x + cell_x[p]] += 1
+    starts = np.zeros(cells_x * cells_y + 1, dtype=np.int64)
+    for c in range(cells_x * cells_y):
+        starts[c + 1] = starts[c] + counts[c]
+    fill = starts[:-1].copy()
+    members = np.empty(n, dtype=np.int64)
+    for p in range(n):
+        key = cell_y[p] * cells_x + cell_x[p]
+        members[fill[key]] = p
+        fill[key] += 1
+
+    found_i = []
+    found_j = []
+    for p in range(n):
+        for d_x, d_y in ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1)):
+            neighbour_x = cell_x[p] + d_x
+            neighbour_y = cell_y[p] + d_y
+            if neighbour_x < 0 or neighbour_x >= cells_x or neighbour_y >= cells_y:
+                continue
+            key = neighbour_y * cells_x + neighbour_x
+            for m in range(starts[key], starts[key + 1]):
+                q = members[m]
+                if d_x == 0 and d_y == 0 and q <= p:
+                    continue
+                if (x[p] - x[q]) ** 2 + (y[p] - y[q]) ** 2 < (radius[p] + radius[q]) ** 2:
+                    found_i.append(min(p, q))
+                    found_j.append(max(p, q))
+
+    pairs_i = np.array(found_i, dtype=np.int64)
+    pairs_j = np.array(found_j, dtype=np.int64)
+    order = np.argsort(pairs_i * n + pairs_j)
+    return pairs_i[order], pairs_j[order]
+
+
+@numba.njit(cache=True)
+def resolve_pairs(x, y, vx, vy, mass, FPT, FPL, impacts, pairs_i, pairs_j, time_s):
+    collisions = 0
+    for k in range(len(pairs_i)):
+        i = pairs_i[k]
+        j = pairs_j[k]
+        dx = x[j] - x[i]
+        dy = y[j] - y[i]
+        if (dx * (vx[i] - vx[j]) + dy * (vy[i] - vy[j])) * time_s <= 0 or (dx == 0 and dy == 0):
+            continue
+        for s in (i, j):
+            impacts[s] += 1
+            FPL[s] = (FPL[s] * (impacts[s] - 1) + FPT[s] * math.hypot(vx[s], vy[s])) / impacts[s]
+            FPT[s] = 0
+        dist = math.hypot(dx, dy)
+        nx = dx / dist
+        ny = dy / dist
+        v_i = vx[i] * nx + vy[i] * ny
+        v_j = vx[j] * nx + vy[j] * ny
+        m_i = mass[i]
+        m_j = mass[j]
+        d_v_i = ((m_i - m_j) * v_i + 2 * m_j * v_j) / (m_i + m_j) - v_i
+        d_v_j = (2 * m_i * v_i + (m_j - m_i) * v_j) / (m_i + m_j) - v_j
+        vx[i] += d_v_i * nx
+        vy[i] += d_v_i * ny
+        vx[j] += d_v_j * nx
+        vy[j] += d_v_j * ny
+        collisions += 1
+    return collisions
+
+
+@numba.njit(cache=True)
+def reflect_walls(x, y, vx, vy, mass, x_next, y_next, time_s, low, high_x, high_y):
+    walls = 0
+    impulse = 0.0
+    for p in range(len(x)):
+        if x_next[p] >= high_x[p] and vx[p] * time_s > 0:
+            impulse += 2 * mass[p] * abs(vx[p])
+            vx[p] *= -1
+            x[p] = high_x[p]
+            walls += 1
+        if x_next[p] <= low[p] and vx[p] * time_s < 0:
+            impulse += 2 * mass[p] * abs(vx[p])
+            vx[p] *= -1
+            x[p] = low[p]
+            walls += 1
+        if y_next[p] >= high_y[p] and vy[p] * time_s > 0:
+            impulse += 2 * mass[p] * abs(vy[p])
+            vy[p] *= -1
+            y[p] = high_y[p]
+            walls += 1
+        if y_next[p] <= low[p] and vy[p] * time_s < 0:
+            impulse += 2 * mass[p] * abs(vy[p])
+            vy[p] *= -1
+            y[p] = low[p]
+            walls += 1
+    return walls, impulse
+
+
+@numba.njit(cache=True)
+def integrate(x, y, vx, vy, FPT, time_s):
+    for p in range(len(x)):
+        x[p] += vx[p] * time_s
+        y[p] += vy[p] * time_s
+        FPT[p] += time_s
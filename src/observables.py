@@ -0,0 +1,135 @@
+from collections import deque
+
+import numpy as np
+
+
+def autocorrelation(samples):
+    # sum over t of samples[t] * samples[t + lag] for every lag, along the first axis, through one FFT
+    length = len(samples)
+    spectrum = np.fft.rfft(samples, n=2 * length, axis=0)
+    return np.fft.irfft(spectrum * spectrum.conj(), n=2 * length, axis=0)[:length]
+
+
+class Observables:
+    # streaming measurements used as one Field step hook; every observable has a name, update(field) and value()
+    def __init__(self, *observables, every=1):
+        self.every = every
+        self.observables = dict()
+        for observable in observables:
+            self.add(observable)
+
+    def add(self, observable):
+        self.observables[observable.name] = observable
+        return observable
+
+    def __getitem__(self, name):
+        return self.observables[name]
+
+    def __call__(self, field):
+        if field.ticks % self.every == 0:
+            for observable in self.observables.values():
+                observable.update(field)
+
+    def values(self):
+        return {name: observable.value() for name, observable in self.observables.items()}
+
+
+class WallPressure:
+    # force per unit wall length from the momentum handed to the walls over the last window samples
+    name = 'pressure'
+
+    def __init__(self, window=100):
+        self.samples = deque(maxlen=window)
+
+    def update(self, field):
+        perimeter = 2 * (field.field_size_x + field.field_size_y - 4 * field.wall_width)
+        self.samples.append((field.simulated_time, field.wall_impulse, perimeter))
+
+    def value(self):
+        if len(self.samples) < 2:
+            return 0
+        (time_start, impulse_start, _), (time_end, impulse_end, perimeter) = self.samples[0], self.samples[-1]
+        if time_end == time_start:
+            return 0
+        return (impulse_end - impulse_start) / (abs(time_end - time_start) * perimeter)
+
+
+class Temperature:
+    # temperature of the running statistics averaged over the last window samples
+    name = 'temperature'
+
+    def __init__(self, window=100):
+        self.samples = deque(maxlen=window)
+
+    def update(self, field):
+        self.samples.append(field.statistics.temperature())
+
+    def value(self):
+        return np.mean(self.samples) if self.samples else 0
+
+
+class BlockCorrelation:
+    # collects window samples of two particle columns, turns every full block into per-lag averages and keeps
+    # only their running sums, so memory stays at one block whatever the length of the run
+    columns = ()
+
+    def __init__(self, window=256):
+        self.window = window
+        self.block = list()
+        self.interval = 0
+        self.last_time = None
+        self.sums = np.zeros(window)
+        self.counts = np.zeros(window)
+
+    def update(self, field):
+        n = field.number_of_spheres
+        if self.block and n != self.block[-1].shape[0]:
+            self.block = list()  # particles were added, the block no longer lines up
+        if self.last_time is not None:
+            self.interval = abs(field.simulated_time - self.last_time)
+        self.last_time = field.simulated_time
+        self.block.append(np.stack([getattr(field, name)[:n] for name in self.columns], axis=1))
+        if len(self.block) == self.window:
+            lags = np.arange(self.window, 0, -1)
+            self.sums += self.correlate(np.array(self.block)) * lags
+            self.counts += lags
+            self.block = list()
+
+    def correlate(self, samples):
+        raise NotImplementedError
+
+    def value(self):
+        # lag times and averages over all completed blocks
+        with np.errstate(invalid='ignore'):
+            return np.arange(self.window) * self.interval, self.sums / self.counts
+
+
+class MeanSquaredDisplacement(BlockCorrelation):
+    name = 'msd'
+    columns = ('x', 'y')
+
+    def correlate(self, samples):
+        # <|r(t + lag) - r(t)|^2> = <r^2(t)> + <r^2(t + lag)> - 2 <r(t) r(t + lag)>, the last term by FFT
+        # displacements do not depend on the origin; centring every particle on its block mean keeps the three
+        # terms small, on absolute positions they cancel down to rounding noise
+        samples = samples - np.mean(samples, axis=0)
+        length = len(samples)
+        squares = np.sum(samples ** 2, axis=2)
+        cumulative = np.concatenate((np.zeros((1, squares.shape[1])), np.cumsum(squares, axis=0)))
+        lag = np.arange(length)
+        early = cumulative[length - lag]
+        late = cumulative[length] - cumulative[lag]
+        products = np.sum(autocorrelation(samples), axis=2)
+        msd = np.mean((early + late - 2 * products) / (length - lag)[:, None], axis=1)
+        msd[0] = 0  # by definition, the FFT leaves rounding noise there
+        return msd
+
+
+class VelocityAutocorrelation(BlockCorrelation):
+    name = 'vacf'
+    columns = ('vx', 'vy')
+
+    def correlate(self, samples):
+        # <v(t) v(t + lag)>, not normalised
+        lag = np.arange(len(samples))
+        return np.mean(np.sum(autocorrelation(samples), axis=2) / (len(samples) - lag)[:, None], axis=1)
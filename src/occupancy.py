@@ -0,0 +1,141 @@
+import numpy as np
+
+
+# disc stencils by radius, built once per process and shared by every map and particle
+stencils = dict()
+
+
+class Stencil:
+    # (2r - 1) x (2r - 1) boolean disc mask and the pixel offsets of its cells around the centre, read-only
+    def __init__(self, radius):
+        m = np.arange(2 * radius - 1) - radius + 1
+        self.radius = radius
+        self.mask = m[:, None] ** 2 + m[None, :] ** 2 <= ((2 * radius - 1) / 2) ** 2
+        d_y, d_x = np.nonzero(self.mask)
+        self.d_y = d_y - radius + 1
+        self.d_x = d_x - radius + 1
+        for array in (self.mask, self.d_y, self.d_x):
+            array.flags.writeable = False
+
+
+def stencil(radius):
+    radius = int(radius)
+    if radius not in stencils:
+        stencils[radius] = Stencil(radius)
+    return stencils[radius]
+
+
+class OccupancyMap:
+    # 1-based particle index per pixel, kept only in tile x tile blocks (tile a power of two) that currently hold
+    # a particle. A small lookup table maps every block of the field to its slot in the tile pool; pixels outside
+    # the walls are not stored at all and read as the wall value
+    def __init__(self, field_size_x, field_size_y, wall_width, wall=-1, tile=16, dtype=np.int32):
+        self.field_size_x = field_size_x
+        self.field_size_y = field_size_y
+        self.wall_width = wall_width
+        self.wall = wall
+        if tile & (tile - 1):
+            raise ValueError("tile size must be a power of two: " + str(tile))
+        self.tile = tile
+        self.shift = tile.bit_length() - 1
+        self.slots = np.full((-(-field_size_y // tile), -(-field_size_x // tile)), -1, dtype=np.int32)
+        self.tiles = np.zeros((0, tile, tile), dtype=dtype)
+        self.used = 0
+
+    @property
+    def nbytes(self):
+        return self.slots.nbytes + self.tiles.nbytes
+
+    def pixels(self, x, y, radius):
+        # every stencil pixel inside the walls of the discs centred at x, y, with the position of its disc
+        x = np.rint(np.atleast_1d(x)).astype(np.int64)
+        y = np.rint(np.atleast_1d(y)).astype(np.int64)
+        radius = np.atleast_1d(radius).astype(np.int64)
+        empty = np.zeros(0, dtype=np.int64)
+        owners, pixels_x, pixels_y = [empty], [empty], [empty]
+        for r in np.unique(radius).tolist():
+            members = np.nonzero(radius == r)[0]
+            disc = stencil(r)
+            owners.append(np.repeat(members, len(disc.d_x)))
+            pixels_x.append((x[members, None] + disc.d_x).ravel())
+            pixels_y.append((y[members, None] + disc.d_y).ravel())
+        owner, pixel_x, pixel_y = np.concatenate(owners), np.concatenate(pixels_x), np.concatenate(pixels_y)
+        inside = ((pixel_x >= self.wall_width) & (pixel_x < self.field_size_x - self.wall_width) &
+                  (pixel_y >= self.wall_width) & (pixel_y < self.field_size_y - self.wall_width))
+        return owner[inside], pixel_x[inside], pixel_y[inside]
+
+    def reserve(self, count):
+        if count <= len(self.tiles):
+            return
+        # the pool never needs more blocks than the field has
+        count = max(count, min(2 * len(self.tiles), self.slots.size))
+        tiles = np.zeros((count, self.tile, self.tile), dtype=self.tiles.dtype)
+        tiles[:len(self.tiles)] = self.tiles
+        self.tiles = tiles
+
+    def materialize(self, x, y, radius):
+        # hands out blocks for every tile under the bounding boxes of the discs, a few per disc
+        x = np.rint(np.atleast_1d(x)).astype(np.int64)
+        y = np.rint(np.atleast_1d(y)).astype(np.int64)
+        radius = np.atleast_1d(radius).astype(np.int64)
+        span = int(np.max(2 * radius - 2, initial=0)) // self.tile + 2
+        step = np.arange(span)
+        tiles_y, tiles_x = self.slots.shape
+        tile_y = np.minimum((y - radius + 1)[:, None] // self.tile + step, (y + radius - 1)[:, None] // self.tile)
+        tile_x = np.minimum((x - radius + 1)[:, None] // self.tile + step, (x + radius - 1)[:, None] // self.tile)
+        keys = (np.clip(tile_y, 0, tiles_y - 1)[:, :, None] * tiles_x + np.clip(tile_x, 0, tiles_x - 1)[:, None, :])
+        keys = np.unique(keys)
+        keys = keys[self.slots.flat[keys] < 0]
+        new = np.arange(self.used, self.used + len(keys), dtype=np.int32)
+        self.reserve(self.used + len(keys))
+        self.tiles[new] = 0
+        self.slots.flat[keys] = new
+        self.used += len(keys)
+
+    def clear(self):
+        # the pool is kept and reused, blocks are zeroed when they are handed out again
+        self.slots[:] = -1
+        self.used = 0
+
+    def stamp(self, x, y, radius, index):
+        # all discs in one pass; where discs overlap the highest index wins, as with stamping one after another
+        self.materialize(x, y, radius)
+        owner, pixel_x, pixel_y = self.pixels(x, y, radius)
+        np.maximum.at(self.tiles.reshape(-1), self.flat(pixel_x, pixel_y),
+                      np.atleast_1d(index)[owner].astype(self.tiles.dtype))
+
+    def flat(self, pixel_x, pixel_y):
+        # position in the flattened tile pool, -1 for pixels in blocks that are not handed out
+        slot = self.slots[pixel_y >> self.shift, pixel_x >> self.shift].astype(np.int64)
+        in_tile = ((pixel_y & (self.tile - 1)) << self.shift) | (pixel_x & (self.tile - 1))
+        return np.where(slot >= 0, (slot << 2 * self.shift) | in_tile, -1)
+
+    def lookup(self, pixel_x, pixel_y):
+        # indices at pixels inside the walls, 0 where nothing is stamped
+        flat = self.flat(pixel_x, pixel_y)
+        stored = flat >= 0
+        index = np.zeros(len(pixel_x), dtype=self.tiles.dtype)
+        index[stored] = self.tiles.reshape(-1)[flat[stored]]
+        return index
+
+    def __getitem__(self, position):
+        # single pixel as (y, x), like the dense map it replaces
+        y, x = position
+        if not (self.wall_width <= x < self.field_size_x - self.wall_width and
+                self.wall_width <= y < self.field_size_y - self.wall_width):
+            return self.wall
+        return int(self.lookup(np.array([x]), np.array([y]))[0])
+
+    def overlaps(self, x, y, radius):
+        # (position of the disc, stamped index) for every stamped pixel under the discs centred at x, y
+        owner, pixel_x, pixel_y = self.pixels(x, y, radius)
+        index = self.lookup(pixel_x, pixel_y)
+        hit = index > 0
+        return owner[hit], index[hit]
+
+    def is_occupied(self, x, y, radius):
+        # the disc reaches a wall or covers a stamped pixel
+        if (min(x, y) - radius + 1 < self.wall_width or x + radius - 1 >= self.field_size_x - self.wall_width or
+                y + radius - 1 >= self.field_size_y - self.wall_width):
+            return True
+        return len(self.overlaps(x, y, radius)[0]) > 0
@@ -0,0 +1,114 @@
+import numpy as np
+import pygame
+
+from engine import colors
+
+sprite_color_key = (255, 0, 255)
+
+
+class ParticleRenderer:
+    # draws a whole snapshot onto an off-screen field surface that the window blits once per frame
+    def __init__(self, field_size_x, field_size_y, wall_width, background=colors['white'], wall=colors['red'],
+                 dot_threshold=5000):
+        self.surface = pygame.Surface((field_size_x, field_size_y))
+        self.background = pygame.Surface((field_size_x, field_size_y))
+        self.background.fill(wall)
+        pygame.draw.rect(self.background, background,
+                         (wall_width, wall_width, field_size_x - 2 * wall_width, field_size_y - 2 * wall_width))
+        self.dot_threshold = dot_threshold
+        self.sprites = dict()
+
+    def sprite(self, radius, color):
+        key = (radius, color)
+        if key not in self.sprites:
+            sprite = pygame.Surface((2 * radius + 1, 2 * radius + 1))
+            sprite.fill(sprite_color_key)
+            pygame.draw.circle(sprite, color, (radius, radius), radius)
+            sprite.set_colorkey(sprite_color_key)
+            self.sprites[key] = sprite
+        return self.sprites[key]
+
+    def render(self, snapshot):
+        self.surface.blit(self.background, (0, 0))
+        if snapshot.number_of_spheres > self.dot_threshold:
+            self.render_dots(snapshot)
+        else:
+            self.render_sprites(snapshot)
+        return self.surface
+
+    def render_sprites(self, snapshot):
+        radius = snapshot.radius.astype(int)
+        color = snapshot.color_map.astype(int)
+        # one pre-rendered stamp per radius/colour pair, every particle refers to its stamp by index
+        keys, inverse = np.unique(radius << 24 | color[:, 0] << 16 | color[:, 1] << 8 | color[:, 2],
+                                  return_inverse=True)
+        stamps = [self.sprite(key >> 24, ((key >> 16) & 255, (key >> 8) & 255, key & 255))
+                  for key in keys.tolist()]
+        x = np.rint(snapshot.x).astype(int) - radius
+        y = np.rint(snapshot.y).astype(int) - radius
+        self.surface.blits([(stamps[stamp], position)
+                            for stamp, position in zip(inverse.ravel().tolist(), zip(x.tolist(), y.tolist()))],
+                           doreturn=False)
+
+    def render_dots(self, snapshot):
+        # level of detail for crowded fields: one pixel per particle written straight into the surface
+        x = np.clip(np.rint(snapshot.x).astype(int), 0, self.surface.get_width() - 1)
+        y = np.clip(np.rint(snapshot.y).astype(int), 0, self.surface.get_height() - 1)
+        pixels = pygame.surfarray.pixels3d(self.surface)
+        pixels[x, y] = snapshot.color_map
+        del pixels
+
+
+class HistogramRenderer:
+    def __init__(self, width, height, background=colors['white'], bar=colors['blue'], curve=colors['green']):
+        self.surface = pygame.Surface((width, height))
+        self.pixels = np.empty((width, height, 3), dtype=np.uint8)
+        self.background = background
+        self.bar = bar
+        self.curve = curve
+
+    def render(self, n_hist, v, n):
+        # bars come from one array operation, the curve is a single polyline; v and n are already in pixels
+        width, height = self.surface.get_size()
+        bar_width = width / len(n_hist)
+        bar_height = n_hist * height / max(np.max(n_hist), 1)
+        column = np.arange(width)
+        bar = np.minimum((column / bar_width).astype(int), len(n_hist) - 1)
+        in_bar = column >= bar * bar_width + 1
+        filled = in_bar[:, None] & (np.arange(height)[None, :] >= height - bar_height[bar][:, None])
+        self.pixels[:] = self.background
+        self.pixels[filled] = self.bar
+        pygame.surfarray.blit_array(self.surface, self.pixels)
+        if len(v) > 1:
+            pygame.draw.lines(self.surface, self.curve, False, list(zip(v.tolist(), (height - n).tolist())), 2)
+        return self.surface
+
+
+class ProfilerOverlay:
+    # profiler reports as text: milliseconds per timed step for every phase, totals for the counters
+    def __init__(self, width, height, font, background=colors['white'], text=colors['black']):
+        self.surface = pygame.Surface((width, height))
+        self.font = font
+        self.background = background
+        self.text = text
+
+    def lines(self, title, report):
+        lines = [title + " ({} ticks)".format(report['ticks'])]
+        for phase, seconds in report['seconds'].items():
+            lines.append("  {} {:.3f} ms".format(phase, 1000 * seconds / max(report['sampled_ticks'], 1)))
+        for counter, value in report['counters'].items():
+            if value:
+                lines.append("  {} {}".format(counter, value))
+        return lines
+
+    def render(self, *reports):
+        # reports are (title, report) pairs, a report of None is skipped
+        self.surface.fill(self.background)
+        lines = list()
+        for title, report in reports:
+            if report is not None:
+                lines.extend(self.lines(title, report))
+        line_height = self.font.get_linesize()
+        for row, line in enumerate(lines[:self.surface.get_height() // line_height]):
+            self.surface.blit(self.font.render(line, True, self.text), (5, row * line_height))
+        return self.surface
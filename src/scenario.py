@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from engine import Field, colors, delta_t
+from species import Species, SpeciesTable
+
+# every key a scenario file may set, with the value used when it is left out; the GUI and headless runs
+# share the file, the duration and outputs only apply headless
+defaults = {
+    'box': [880, 720],
+    'color': 'silver',
+    'collision_backend': "grid",
+    'mode': "fixed",
+    'kernel_backend': "numpy",
+    'seed': None,
+    'time_rate': 1.0,
+    'max_travel': None,
+    'outliers': 0,
+    'species': [],
+    'order': "rand",
+    'basic': 1,
+    'temperature': None,
+    'spheres': [],
+    'ticks': 1000,
+    'time': None,
+    'outputs': {},
+}
+output_keys = ('summary', 'checkpoint', 'trajectory', 'observables')
+
+
+def color(value):
+    # a name from engine.colors or an RGB triple
+    if isinstance(value, str):
+        if value not in colors:
+            raise ValueError("unknown colour: " + value)
+        return colors[value]
+    return tuple(int(c) for c in value)
+
+
+def load_scenario(path):
+    with open(path) as file:
+        scenario = json.load(file)
+    unknown = set(scenario) - set(defaults)
+    if unknown:
+        raise ValueError("unknown scenario keys: " + ", ".join(sorted(unknown)))
+    unknown = set(scenario.get('outputs', {})) - set(output_keys)
+    if unknown:
+        raise ValueError("unknown scenario outputs: " + ", ".join(sorted(unknown)))
+    return dict(defaults, **scenario)
+
+
+def build_field(scenario):
+    field_size_x, field_size_y = scenario['box']
+    fld = Field(field_size_x, field_size_y, color(scenario['color']), scenario['collision_backend'],
+                scenario['mode'], scenario['seed'], scenario['kernel_backend'])
+    fld.time_rate = scenario['time_rate']
+    fld.max_travel = scenario['max_travel']
+    fld.outliers = scenario['outliers']
+    table = SpeciesTable(Species(**dict(row, color=color(row.get('color', 'black')))) for row in scenario['species'])
+    fld.fill_species(table, scenario['order'], scenario['basic'], scenario['temperature'])
+    for sphere in scenario['spheres']:
+        if 'color' in sphere:
+            sphere = dict(sphere, color=color(sphere['color']))
+        fld.add_sphere(**sphere)
+    return fld
+
+
+def output_paths(outputs, output_dir=".", scenario_path=None):
+    # files the outputs are written to, relative paths inside output_dir; a run never writes over its own
+    # scenario file
+    paths = {name: outputs[name] for name in ('summary', 'checkpoint') if name in outputs}
+    if 'trajectory' in outputs:
+        paths['trajectory'] = outputs['trajectory']['path']
+    paths = {name: os.path.join(output_dir, path) for name, path in paths.items()}
+    for name, path in paths.items():
+        if scenario_path is not None and os.path.realpath(path) == os.path.realpath(scenario_path):
+            raise ValueError("the " + name + " output would overwrite the scenario file: " + path)
+    return paths
+
+
+def attach_outputs(fld, outputs, paths):
+    # step hooks for the outputs that are recorded along the way; their modules load only when asked for
+    attached = dict()
+    if 'trajectory' in outputs:
+        from trajectory import TrajectoryRecorder
+        settings = outputs['trajectory']
+        attached['trajectory'] = TrajectoryRecorder(paths['trajectory'], fld.number_of_spheres,
+                                                    settings.get('every', 1))
+        fld.step_hooks.append(attached['trajectory'])
+    if 'observables' in outputs:
+        import observables
+        settings = outputs['observables']
+        table = {'pressure': observables.WallPressure, 'temperature': observables.Temperature,
+                 'msd': observables.MeanSquaredDisplacement, 'vacf': observables.VelocityAutocorrelation}
+        attached['observables'] = observables.Observables(*(table[name]() for name in settings['names']),
+                                                          every=settings.get('every', 1))
+        fld.step_hooks.append(attached['observables'])
+    return attached
+
+
+def json_value(value):
+    if isinstance(value, np.ndarray):
+        return np.nan_to_num(value).tolist()
+    if isinstance(value, (tuple, list)):
+        return [json_value(item) for item in value]
+    if isinstance(value, dict):
+        return {name: json_value(item) for name, item in value.items()}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def summary(fld, attached, seconds):
+    statistics = fld.statistics
+    result = {'number_of_spheres': fld.number_of_spheres, 'ticks': fld.ticks, 'time': fld.simulated_time,
+              'seconds': seconds, 'T': statistics.temperature(), 'MLS': statistics.MLS(),
+              'FPL_integrate': fld.FPL_integrate, 'FPL_theory': fld.FPL_theory,
+              'wall_impulse': fld.wall_impulse, 'histogram': statistics.histogram()[0]}
+    if len(fld.species_table):
+        result['species'] = statistics.species()
+    if 'observables' in attached:
+        result['observables'] = attached['observables'].values()
+    return json_value(result)
+
+
+def run_headless(fld, scenario, output_dir=".", scenario_path=None):
+    outputs = scenario['outputs']
+    paths = output_paths(outputs, output_dir, scenario_path)
+    if paths:
+        os.makedirs(output_dir, exist_ok=True)
+    attached = attach_outputs(fld, outputs, paths)
+    started = time.perf_counter()
+    if scenario['time'] is not None:
+        fld.advance(scenario['time'], None if scenario['max_travel'] is not None else delta_t)
+    else:
+        fld.run_ticks(scenario['ticks'])
+    seconds = time.perf_counter() - started
+    if 'trajectory' in attached:
+        attached['trajectory'].close()
+    if 'checkpoint' in paths:
+        fld.checkpoint(paths['checkpoint'])
+    result = summary(fld, attached, seconds)
+    if 'summary' in paths:
+        with open(paths['summary'], 'w') as file:
+            json.dump(result, file, indent=2)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a simulation described by a scenario file.")
+    parser.add_argument('scenario', help="JSON scenario file")
+    parser.add_argument('--headless', action='store_true', help="run without a window and write the outputs")
+    parser.add_argument('--ticks', type=int, default=None, help="override the duration of the scenario")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output-dir', default="out", help="directory for the outputs of a headless run")
+    args = parser.parse_args(argv)
+
+    scenario = load_scenario(args.scenario)
+    if args.ticks is not None:
+        scenario.update(ticks=args.ticks, time=None)
+    if args.seed is not None:
+        scenario['seed'] = args.seed
+    fld = build_field(scenario)
+    if not args.headless:
+        # pygame and its fonts are loaded only here, batch runs never pay for them
+        import main as gui
+        if fld.field_size_x > gui.WIDTH - gui.interface_width or fld.field_size_y > gui.HEIGHT:
+            raise ValueError("the window shows boxes up to " + str(gui.WIDTH - gui.interface_width) + "x" +
+                             str(gui.HEIGHT))
+        gui.run(fld)
+        return 0
+    result = run_headless(fld, scenario, args.output_dir, args.scenario)
+    print("N={} ticks={} time={:.1f} in {:.2f}s: T {:.4g}, <lambda> {}/{}".format(
+        result['number_of_spheres'], result['ticks'], result['time'], result['seconds'], result['T'],
+        round(result['FPL_integrate']), round(result['FPL_theory'])), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+import numpy as np
+
+
+class Species:
+    # one kind of particle; count is how many of them Field.fill_species puts on the field
+    def __init__(self, name, mass=1, radius=10, color=(0, 0, 0), count=0):
+        self.name = name
+        self.mass = mass
+        self.radius = radius
+        self.color = tuple(color)
+        self.count = count
+
+
+class SpeciesTable:
+    # species by code, the code is the small integer every particle keeps in Field.species (-1 for none)
+    def __init__(self, species=()):
+        self.species = list()
+        self.codes = dict()
+        for entry in species:
+            self.add(entry)
+
+    @classmethod
+    def from_rows(cls, rows):
+        # rows of Species keyword arguments, e.g. as read from a scenario file
+        return cls(Species(**row) for row in rows)
+
+    def add(self, species):
+        if species.name in self.codes:
+            raise ValueError("species already defined: " + str(species.name))
+        self.codes[species.name] = len(self.species)
+        self.species.append(species)
+        return self.codes[species.name]
+
+    def code(self, name):
+        if name not in self.codes:
+            raise ValueError("unknown species: " + str(name))
+        return self.codes[name]
+
+    def __getitem__(self, code):
+        return self.species[code]
+
+    def __len__(self):
+        return len(self.species)
+
+    def __iter__(self):
+        return iter(self.species)
+
+    @property
+    def names(self):
+        return [species.name for species in self.species]
+
+    def rows(self):
+        # mass, radius, colour and count of every species as one float array, names are kept apart
+        return np.array([(species.mass, species.radius) + species.color + (species.count,)
+                         for species in self.species], dtype=float).reshape(-1, 6)
@@ -0,0 +1,123 @@
+import struct
+
+import numpy as np
+
+# file layout: a fixed-size header followed by equally sized chunks, every chunk holds chunk_frames frames as
+# float64 times and then one float32 block per column, so a single frame is read without touching the rest
+magic = b'PMTRAJ\x00\x01'
+header_format = '<8sIIIIQ64s'
+header_size = 128
+default_columns = ('x', 'y', 'vx', 'vy')
+
+
+def chunk_dtype(number_of_spheres, number_of_columns, chunk_frames):
+    return np.dtype([('time', '<f8', (chunk_frames,)),
+                     ('columns', '<f4', (number_of_columns, chunk_frames, number_of_spheres))])
+
+
+class TrajectoryRecorder:
+    def __init__(self, path, number_of_spheres, every=1, chunk_frames=256, columns=default_columns):
+        self.path = path
+        self.number_of_spheres = number_of_spheres
+        self.every = every
+        self.chunk_frames = chunk_frames
+        self.columns = tuple(columns)
+        self.frames = 0
+        self.chunk = np.zeros(1, dtype=chunk_dtype(number_of_spheres, len(self.columns), chunk_frames))[0]
+        self.chunk_fill = 0
+        self.file = open(path, 'wb')
+        self.write_header()
+
+    def write_header(self):
+        names = ','.join(self.columns).encode('ascii')
+        if len(names) > 64:
+            raise ValueError("column names do not fit into the header: " + ','.join(self.columns))
+        header = struct.pack(header_format, magic, self.number_of_spheres, len(self.columns), self.chunk_frames,
+                             self.every, self.frames, names)
+        self.file.seek(0)
+        self.file.write(header.ljust(header_size, b'\x00'))
+
+    def record(self, field):
+        n = field.number_of_spheres
+        if n != self.number_of_spheres:
+            raise ValueError("recorder expects " + str(self.number_of_spheres) + " particles, field has " + str(n))
+        for column, name in enumerate(self.columns):
+            self.chunk['columns'][column, self.chunk_fill] = getattr(field, name)[:n]
+        self.chunk['time'][self.chunk_fill] = field.simulated_time
+        self.chunk_fill += 1
+        self.frames += 1
+        if self.chunk_fill == self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        if not self.chunk_fill:
+            return
+        self.file.seek(header_size + (self.frames - self.chunk_fill) // self.chunk_frames * self.chunk.nbytes)
+        self.file.write(self.chunk.tobytes())
+        if self.chunk_fill == self.chunk_frames:
+            self.chunk_fill = 0
+        self.write_header()
+        self.file.flush()
+
+    def __call__(self, field):
+        # used as a Field step hook, keeps every k-th tick
+        if field.ticks % self.every == 0:
+            self.record(field)
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class TrajectoryReader:
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            header = file.read(header_size)
+        (file_magic, self.number_of_spheres, number_of_columns, self.chunk_frames, self.every, self.frames,
+         names) = struct.unpack(header_format, header[:struct.calcsize(header_format)])
+        if file_magic != magic:
+            raise ValueError(str(path) + " is not a trajectory file")
+        self.columns = tuple(names.rstrip(b'\x00').decode('ascii').split(','))
+        dtype = chunk_dtype(self.number_of_spheres, number_of_columns, self.chunk_frames)
+        chunks = -(-self.frames // self.chunk_frames)
+        self.chunks = np.memmap(path, dtype=dtype, mode='r', offset=header_size, shape=(chunks,))
+
+    def __len__(self):
+        return self.frames
+
+    def locate(self, index):
+        if index < 0:
+            index += self.frames
+        if not 0 <= index < self.frames:
+            raise IndexError("frame " + str(index) + " out of range")
+        return divmod(index, self.chunk_frames)
+
+    def time(self, index):
+        chunk, frame = self.locate(index)
+        return float(self.chunks[chunk]['time'][frame])
+
+    def frame(self, index):
+        chunk, frame = self.locate(index)
+        columns = self.chunks[chunk]['columns']
+        return {name: np.array(columns[column, frame]) for column, name in enumerate(self.columns)}
+
+    def __getitem__(self, index):
+        return self.frame(index)
+
+    def column(self, name, start=0, stop=None):
+        # one column over a range of frames, shape (frames, number_of_spheres)
+        stop = self.frames if stop is None else min(stop, self.frames)
+        column = self.columns.index(name)
+        frames = [self.chunks[chunk]['columns'][column, frame]
+                  for chunk, frame in (divmod(index, self.chunk_frames) for index in range(start, stop))]
+        return np.array(frames).reshape(-1, self.number_of_spheres)
+
+    def times(self):
+        return np.concatenate([chunk['time'] for chunk in self.chunks])[:self.frames]